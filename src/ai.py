@@ -1,6 +1,14 @@
 # ai.py
 
-from fianco_game import FiancoGame
+from fianco_game import FiancoGame, default_weights
+from constants import BOARD_SIZE
+from bitboard import NUM_SQUARES, MOVE_TUPLES, generate_move_codes
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+from time_manager import TimeManager
+from tablebase import Tablebase, WIN, LOSS, ILLEGAL, DISTANCE_MASK
+from opening_book import OpeningBook
+from search_cache import SearchCache, cache_salt
+from symmetry import MOVE_MAPS, canonical_key
 import sys
 import time
 
@@ -33,82 +41,525 @@ def negamax(game, depth, alpha, beta, color):
             break  # Alpha-beta cutoff
     return max_value
 
+# Scores at or beyond this are decided games (evaluate() returns +-10000 for a win)
+WIN_SCORE = 10000
+
+# Delta pruning: a single capture is not expected to raise the evaluation by more than
+# a piece (10) plus the positional, mobility and threat swings it causes
+DELTA_MARGIN = 25
+
+# Principal variation search: width of the null window used to test later moves
+NULL_WINDOW = 1e-6
+
+# Aspiration windows: initial half-width around the previous iteration's score, widened
+# this many times on each failure before falling back to a full window
+ASPIRATION_WINDOW = 3.0
+ASPIRATION_GROWTH = 4
+
+# Nodes (quiescence nodes included) between two checks of the stop event
+STOP_POLL_NODES = 1024
+
+# Late move reductions: sideways moves searched this late at nodes this deep lose a ply
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVES = 3
+
+# Deepest ply the per-ply move buffers and killer slots cover
+MAX_PLY = 64
+
+# Static ordering bonus of an encoded move, from how far it moves the piece:
+# captures (a diagonal jump) before forward steps before sideways steps
+ORDER_BIAS = [{1: 0, BOARD_SIZE: 1}.get(abs(code // NUM_SQUARES - code % NUM_SQUARES), 2)
+              for code in range(NUM_SQUARES * NUM_SQUARES)]
+
 class AIPlayer:
-    def __init__(self, depth=3, time_limit=5.0):
+    def __init__(self, depth=3, time_limit=5.0, in_place=True, tt_size_mb=16, keep_tt=True, total_time=None,
+                 quiescence=True, tablebase_path=None, book_path=None, eval_weights=None, stats=None,
+                 killers=False, history=True, pvs=True, aspiration=True, lmr=True, cache_path=None,
+                 cache_size_mb=64, symmetry=False):
+        """
+        depth: maximum depth of the iterative deepening search.
+        time_limit: maximum seconds per move.
+        total_time: optional game clock in seconds, split over the remaining moves by the time manager.
+        in_place: search a single private copy of the position with make_move/undo_move
+        instead of cloning the game for every child node.
+        tt_size_mb: memory cap of the transposition table.
+        keep_tt: keep the transposition table between get_move calls (call new_game() to reset it).
+        quiescence: at depth 0, keep searching capture moves before evaluating.
+        tablebase_path: optional directory of endgame tablebase files (see tablebase.py),
+        probed at every node with few enough pieces.
+        book_path: optional opening book file (see book_builder.py), consulted before searching.
+        eval_weights: evaluation weights passed to game.evaluate() (None for the defaults).
+        stats: optional search_stats.SearchStats collector, filled in by every get_move call.
+        killers: try the two moves that last caused a cutoff at the same ply early. Off by default:
+        on top of the history heuristic it searched more nodes on the benchmark positions.
+        history: order the other moves by how often they caused cutoffs (history heuristic).
+        pvs: principal variation search; moves after the first are searched with a null window
+        and only re-searched with the full window if they turn out better.
+        aspiration: search the root with a narrow window around the previous depth's score.
+        lmr: late move reductions; sideways moves ordered late are searched one ply shallower
+        first (and re-searched at full depth if they beat alpha).
+        cache_path: optional persistent search cache file (see search_cache.py), shared with
+        other games and processes: a deep enough exact result for the root is played without
+        searching, and deep nodes missing from the transposition table are looked up there.
+        cache_size_mb: size of the cache file if it has to be created.
+        symmetry: key the transposition table and the cache on the canonical image of each
+        position under the board's symmetries (see symmetry.py), so mirrored and
+        colour-swapped positions share their entries.
+        """
         self.depth = depth
         self.time_limit = time_limit
+        self.in_place = in_place
+        self.keep_tt = keep_tt
+        self.quiescence = quiescence
+        self.tablebase = Tablebase(tablebase_path) if tablebase_path else None
+        self.book_path = book_path
+        self.book = None  # Opened on first use
+        self.eval_weights = eval_weights
+        self.cache_path = cache_path
+        self.cache_size_mb = cache_size_mb
+        self.cache = None  # Opened on first use
+        self.symmetry = symmetry
+        self.stats = stats
+        self.use_killers = killers
+        self.use_history = history
+        self.pvs = pvs
+        self.aspiration = aspiration
+        self.lmr = lmr
+        # Move ordering state; moves are encoded as ints (from_square * 81 + to_square) in the search
+        self.killers = [[-1, -1] for _ in range(MAX_PLY)]
+        self.history = [0] * (NUM_SQUARES * NUM_SQUARES)  # Cutoff scores indexed by encoded move
+        self._move_buffers = [[] for _ in range(MAX_PLY)]  # Move list of each ply, reused between nodes
+        self.root_ply = 0
         self.start_time = None
-        self.transposition_table = {}
+        self.deadline = None
+        self.time_manager = TimeManager(time_limit, total_time)
+        self.transposition_table = TranspositionTable(tt_size_mb)
+        self.nodes = 0
+        self.qnodes = 0  # Quiescence nodes, included in nodes
+        self.principal_variation = []
+        self._pv_moves = {}
+        self.completed_depth = 0
+        self.best_value = None
+        self.start_depth = 1  # First iteration of iterative deepening
+        self.root_offset = 0  # Rotate the root move order (used to diversify parallel helpers)
+        self.stop_event = None  # Optional threading/multiprocessing Event that aborts the search
+        self._next_poll = STOP_POLL_NODES  # Node count at which negamax next checks stop_event
+        # Optional callback(depth, best_move, best_value, nodes) after each depth (principal_variation is up to date)
+        self.on_iteration = None
+
+    def new_game(self):
+        """
+        Forget everything learned in the previous game.
+        """
+        self.transposition_table.clear()
+        if self.cache is not None:
+            self.cache.new_generation()
 
     def get_move(self, game):
+        """
+        Determine the best move for the AI player (see _get_move), recording search
+        statistics if a collector is attached.
+        """
+        if self.stats is None:
+            return self._get_move(game)
+        self.stats.start(game)
+        move = self._get_move(game)
+        self.stats.finish(self, move)
+        return move
+
+    def _get_move(self, game):
         """
         Determine the best move for the AI player.
+        Searches depth 1, 2, ... up to self.depth and returns the best move of the
+        deepest completed iteration; an iteration cut short by the clock is discarded.
         """
         self.current_player = game.current_player  # Set the current player
-        self.start_time = time.time()
-        self.transposition_table = {}
+        self.time_manager.time_limit = self.time_limit
+        self.time_manager.start(game)
+        self.start_time = self.time_manager.start_time
+        self.deadline = self.time_manager.deadline
+        if not self.keep_tt:
+            self.transposition_table.clear()
+        self.transposition_table.new_search()
+        self.nodes = 0
+        self.qnodes = 0
+        self._next_poll = STOP_POLL_NODES
+        self.completed_depth = 0
+        self.best_value = None
+        self.root_ply = game.move_count
+        for killers in self.killers:
+            killers[0] = killers[1] = -1
+        # Old history scores fade rather than disappear: most of them still apply one move later
+        self.history = [score >> 1 for score in self.history]
+        if self.book_path:
+            if self.book is None:
+                self.book = OpeningBook(self.book_path)
+            book_move = self.book.choose(game)
+            if book_move is not None:
+                return book_move
+        if self.cache_path:
+            if self.cache is None:
+                # Scores depend on the evaluation and the tablebase, so differently configured
+                # engines use separate keys
+                salt = cache_salt(self.eval_weights or default_weights(), self.quiescence,
+                                  self.tablebase.max_pieces if self.tablebase is not None else 0)
+                self.cache = SearchCache(self.cache_path, self.cache_size_mb, salt)
+            cached_move = self._cached_root_move(game)
+            if cached_move is not None:
+                return cached_move
+        if self.in_place:
+            # One copy per search: a timeout may unwind with moves still applied to it
+            game = game.clone()
+
+        root_moves = list(self._ordered_moves(game, self._probe(game, self.transposition_table), 0))
+        if len(root_moves) <= 1:
+            return MOVE_TUPLES[root_moves[0]] if root_moves else None  # Forced move: nothing to think about
+        if self.root_offset:
+            offset = self.root_offset % len(root_moves)
+            root_moves = root_moves[offset:] + root_moves[:offset]
+        best_move = root_moves[0]
+        for depth in range(self.start_depth, self.depth + 1):
+            if depth > self.start_depth and not self.time_manager.can_start_iteration():
+                break
+            try:
+                best_value, best_move = self._aspiration_search(game, root_moves, depth)
+            except TimeoutError:
+                break
+            self.completed_depth = depth
+            self.best_value = best_value
+            self.time_manager.iteration_finished(best_move)
+            self._set_principal_variation(game, depth)
+            if self.stats is not None:
+                self.stats.iteration_finished(depth, self.nodes, MOVE_TUPLES[best_move], best_value)
+            if self.on_iteration is not None:
+                self.on_iteration(depth, MOVE_TUPLES[best_move], best_value, self.nodes)
+            # The next iteration searches the previous best move first
+            root_moves.remove(best_move)
+            root_moves.insert(0, best_move)
+            if abs(best_value) >= WIN_SCORE:
+                break  # Forced win or loss found: deeper search will not change it
+        return MOVE_TUPLES[best_move]
+
+    def _aspiration_search(self, game, root_moves, depth):
+        """
+        Search the root, with an aspiration window around the previous iteration's score
+        if enabled: the window is widened and the root searched again whenever the score
+        falls outside it.
+        Returns (best_value, best_move).
+        """
+        previous = self.best_value
+        if not self.aspiration or previous is None or abs(previous) >= WIN_SCORE:
+            return self._search_root(game, root_moves, depth, float('-inf'), float('inf'))
+        delta = ASPIRATION_WINDOW
+        alpha, beta = previous - delta, previous + delta
+        for _ in range(ASPIRATION_GROWTH):
+            best_value, best_move = self._search_root(game, root_moves, depth, alpha, beta)
+            if alpha < best_value < beta:
+                return best_value, best_move
+            if self.stats is not None:
+                self.stats.researches += 1
+            delta *= ASPIRATION_GROWTH
+            if best_value <= alpha:
+                alpha = best_value - delta
+            else:
+                beta = best_value + delta
+        return self._search_root(game, root_moves, depth, float('-inf'), float('inf'))
+
+    def _search_root(self, game, root_moves, depth, alpha, beta):
+        """
+        Search all root moves (encoded) to the given depth within (alpha, beta).
+        Returns (best_value, best_move).
+        """
+        alpha_orig = alpha
+        best_value = float('-inf')
         best_move = None
-        try:
-            best_value = float('-inf')
-            alpha = float('-inf')
-            beta = float('inf')
-            possible_moves = game.get_possible_moves(game.current_player)
-            possible_moves.sort(key=self.move_sort_key, reverse=True)
-            for move in possible_moves:
-                game_copy = game.clone()
-                game_copy.make_move(move)
-                value = -self.negamax(game_copy, self.depth - 1, -beta, -alpha, -1)
-                if value > best_value:
-                    best_value = value
-                    best_move = move
-                alpha = max(alpha, value)
-                if alpha >= beta:
-                    break
-            return best_move
-        except TimeoutError:
-            return best_move  # Return the best move found so far
-
-    def negamax(self, game, depth, alpha, beta, color):
-        if time.time() - self.start_time > self.time_limit:
+        for index, move in enumerate(root_moves):
+            value = self._search_move(game, move, index, depth, alpha, beta)
+            if value > best_value:
+                best_value = value
+                best_move = move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+        if best_value <= alpha_orig:
+            flag = UPPER
+        elif best_value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        key, symmetry = self._table_key(game)
+        self.transposition_table.store(key, depth, flag, best_value, MOVE_MAPS[symmetry][best_move])
+        if self.cache is not None:
+            self.cache.store(key, depth, flag, best_value, MOVE_MAPS[symmetry][best_move])
+        return best_value, best_move
+
+    def _table_key(self, game):
+        """
+        (key, symmetry): the key of the position in the transposition table and the cache,
+        and the symmetry mapping moves between the position and its stored image.
+        """
+        if self.symmetry:
+            return canonical_key(game.symmetric_hash)
+        return game.hash, 0
+
+    def _probe(self, game, table):
+        """
+        Look up a position in the transposition table or the cache, with the move of the
+        entry mapped back onto the position (the symmetries are their own inverses).
+        """
+        key, symmetry = self._table_key(game)
+        entry = table.probe(key)
+        if symmetry and entry is not None and entry[3] >= 0:
+            entry = entry[:3] + (MOVE_MAPS[symmetry][entry[3]],)
+        return entry
+
+    def _cached_root_move(self, game):
+        """
+        The move of an exact cached result for this position at least self.depth deep,
+        or None. The position's history is not part of the key, so a move that would lose
+        by repetition here is not trusted.
+        """
+        entry = self._probe(game, self.cache)
+        if entry is None or entry[1] != EXACT or entry[0] < self.depth or entry[3] < 0:
+            return None
+        move = MOVE_TUPLES[entry[3]]
+        if move not in game.get_possible_moves(game.current_player):
+            return None
+        game_copy = game.clone()
+        game_copy.make_move(move)
+        if game_copy.get_winner() == game_copy.current_player:
+            return None
+        if self.stats is not None:
+            self.stats.cache_hits += 1
+        self.completed_depth = entry[0]
+        self.best_value = entry[2]
+        self.principal_variation = [move]
+        return move
+
+    def _search_move(self, game, move, index, depth, alpha, beta):
+        """
+        Score of `move`, the index-th move searched at a node of the given depth.
+        The first move gets the full window. With PVS, later moves are first tested with a
+        null window (only whether they beat alpha), and with LMR late sideways moves are
+        tested one ply shallower; either is re-searched when the test says the move is better.
+        """
+        if index == 0 or not (self.pvs or self.lmr):
+            return -self._search_child(game, move, depth - 1, -beta, -alpha)
+        window = alpha + NULL_WINDOW if self.pvs else beta
+        reduction = 1 if self.lmr and depth >= LMR_MIN_DEPTH and index >= LMR_MIN_MOVES and ORDER_BIAS[move] == 0 else 0
+        value = -self._search_child(game, move, depth - 1 - reduction, -window, -alpha)
+        if reduction and value > alpha:
+            if self.stats is not None:
+                self.stats.researches += 1
+            value = -self._search_child(game, move, depth - 1, -window, -alpha)
+        if window < beta and alpha < value < beta:
+            if self.stats is not None:
+                self.stats.researches += 1
+            value = -self._search_child(game, move, depth - 1, -beta, -alpha)
+        return value
+
+    def _set_principal_variation(self, game, depth):
+        """
+        Follow the best moves stored in the transposition table from the root and remember
+        them, so the next iteration searches the principal variation first.
+        """
+        pv = []
+        pv_moves = {}
+        while len(pv) < depth:
+            entry = self._probe(game, self.transposition_table)
+            if entry is None or entry[3] < 0:
+                break
+            move = MOVE_TUPLES[entry[3]]
+            if move not in game.get_possible_moves(game.current_player):
+                break
+            pv_moves[game.hash] = entry[3]
+            pv.append(move)
+            game.make_move(move)
+        for _ in pv:
+            game.undo_move()
+        self.principal_variation = pv
+        self._pv_moves = pv_moves
+
+    def _search_child(self, game, move, depth, alpha, beta):
+        """
+        Search the position after `move` (encoded) and return its score from the opponent's point of view.
+        """
+        move = MOVE_TUPLES[move]
+        if self.in_place:
+            game.make_move(move)
+            value = self.negamax(game, depth, alpha, beta)
+            game.undo_move()
+            return value
+        game_copy = game.clone()
+        game_copy.make_move(move)
+        return self.negamax(game_copy, depth, alpha, beta)
+
+    def negamax(self, game, depth, alpha, beta):
+        """
+        Negamax with alpha-beta pruning.
+        Scores are from the point of view of the player to move, as returned by game.evaluate().
+        """
+        if time.time() > self.deadline:
             raise TimeoutError
-        # Generate a hashable key for the current game state
-        board_key = self._generate_board_key(game.board, game.current_player)
-        if board_key in self.transposition_table:
-            return self.transposition_table[board_key]
+        self.nodes += 1
+        if self.nodes >= self._next_poll:
+            # A threshold rather than a multiple of STOP_POLL_NODES: quiescence nodes
+            # advance the count too, and may step over any exact value
+            self._next_poll = self.nodes + STOP_POLL_NODES
+            if self.stop_event is not None and self.stop_event.is_set():
+                raise TimeoutError
+        stats = self.stats
+        if self.symmetry:
+            key, symmetry = canonical_key(game.symmetric_hash)
+        else:
+            key, symmetry = game.hash, 0
+        entry = self.transposition_table.probe(key)
+        if stats is not None:
+            stats.tt_probes += 1
+            stats.tt_hits += entry is not None
+        if entry is None and self.cache is not None and depth >= self.cache.min_depth:
+            entry = self.cache.probe(key)
+            if stats is not None:
+                stats.cache_hits += entry is not None
+        if symmetry and entry is not None and entry[3] >= 0:
+            entry = entry[:3] + (MOVE_MAPS[symmetry][entry[3]],)
+        if entry is not None and entry[0] >= depth:
+            # Only reuse results searched at least as deep, and only within their bound
+            entry_depth, flag, score, move_code = entry
+            if flag == EXACT:
+                if stats is not None:
+                    stats.tt_cutoffs += 1
+                return score
+            if flag == LOWER:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if alpha >= beta:
+                if stats is not None:
+                    stats.tt_cutoffs += 1
+                return score
 
+        if self.tablebase is not None:
+            tb_score = self._probe_tablebase(game)
+            if tb_score is not None:
+                return tb_score
+
+        if depth == 0 and self.quiescence and not game.is_terminal():
+            return self.quiescence_search(game, alpha, beta)
         if depth == 0 or game.is_terminal():
-            eval_score = color * game.evaluate()
-            self.transposition_table[board_key] = eval_score
+            eval_score = game.evaluate(self.eval_weights)
+            if stats is not None:
+                stats.evaluations += 1
+            self.transposition_table.store(key, depth, EXACT, eval_score)
             return eval_score
 
+        alpha_orig = alpha
         max_value = float('-inf')
-        possible_moves = game.get_possible_moves(game.current_player)
-        possible_moves.sort(key=self.move_sort_key, reverse=True)
-        for move in possible_moves:
-            game_copy = game.clone()
-            game_copy.make_move(move)
-            value = -self.negamax(game_copy, depth - 1, -beta, -alpha, -color)
-            max_value = max(max_value, value)
+        best_move = None
+        ply = game.move_count - self.root_ply
+        for index, move in enumerate(self._ordered_moves(game, entry, ply)):
+            value = self._search_move(game, move, index, depth, alpha, beta)
+            if value > max_value:
+                max_value = value
+                best_move = move
             alpha = max(alpha, value)
             if alpha >= beta:
+                if self.use_killers:
+                    killers = self.killers[ply]
+                    if killers[0] != move:
+                        killers[1] = killers[0]
+                        killers[0] = move
+                if self.use_history:
+                    self.history[move] += depth * depth
+                if stats is not None:
+                    stats.cutoffs += 1
+                    stats.first_move_cutoffs += index == 0
                 break
-        self.transposition_table[board_key] = max_value
+        if max_value <= alpha_orig:
+            flag = UPPER
+        elif max_value >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        best_move = MOVE_MAPS[symmetry][best_move]  # Stored as a move of the canonical image
+        self.transposition_table.store(key, depth, flag, max_value, best_move)
+        if self.cache is not None:
+            self.cache.store(key, depth, flag, max_value, best_move)
         return max_value
 
-    def _generate_board_key(self, board, player):
+    def _probe_tablebase(self, game):
         """
-        Generate a hashable key representing the board state and current player.
+        Exact score of a position from the endgame tablebase, or None if it is not covered.
+        Wins score WIN_SCORE minus the distance to the end, so shorter wins are preferred.
         """
-        return (tuple(map(tuple, board)), player)
+        white, black = game.pieces[1], game.pieces[2]
+        max_pieces = self.tablebase.max_pieces
+        if white.bit_count() > max_pieces or black.bit_count() > max_pieces:
+            return None
+        value = self.tablebase.probe_raw(white, black, game.current_player)
+        if value is None or value == ILLEGAL:
+            return None
+        if value & WIN:
+            return WIN_SCORE - (value & DISTANCE_MASK)
+        if value & LOSS:
+            return -WIN_SCORE + (value & DISTANCE_MASK)
+        return 0
 
-    def move_sort_key(self, move):
-        start_i, start_j, end_i, end_j = move
-        is_capture = abs(start_i - end_i) == 2
-        # Calculate advancement for both players
-        if self.current_player == 1:
-            advancement = start_i - end_i
-        else:
-            advancement = end_i - start_i
-        return (is_capture, advancement)
+    def quiescence_search(self, game, alpha, beta):
+        """
+        Search only capture moves until the position is quiet, so pending exchanges are
+        resolved before the static evaluation is trusted.
+        The static evaluation is used as a stand-pat lower bound (treating the capture as
+        optional, the usual approximation), and captures that cannot lift the score up to
+        alpha are skipped (delta pruning).
+        """
+        if time.time() > self.deadline:
+            raise TimeoutError
+        self.nodes += 1
+        self.qnodes += 1
+        stand_pat = game.evaluate(self.eval_weights)
+        if self.stats is not None:
+            self.stats.evaluations += 1
+        if stand_pat >= beta or abs(stand_pat) >= WIN_SCORE:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
 
+        best_value = stand_pat
+        player = game.current_player
+        goal_row = 0 if player == 1 else 8
+        for move in game.get_captures(player):
+            if stand_pat + DELTA_MARGIN <= alpha and move[2] != goal_row:
+                continue  # Delta pruning: even winning the piece cannot reach alpha
+            game.make_move(move)
+            value = -self.quiescence_search(game, -beta, -alpha)
+            game.undo_move()
+            if value > best_value:
+                best_value = value
+            if value >= beta:
+                break
+            alpha = max(alpha, value)
+        return best_value
 
+    def _ordered_moves(self, game, entry, ply):
+        """
+        Return the legal moves, encoded, in the move buffer of the ply: the previous iteration's
+        principal variation move or the stored transposition-table move first, then the
+        two killer moves of the ply, then the rest by history score and ORDER_BIAS.
+        """
+        player = game.current_player
+        moves = generate_move_codes(game.pieces[player], game.pieces[3 - player], player, self._move_buffers[ply])
+        if self.use_history:
+            history = self.history
+            moves.sort(key=lambda code: history[code] * 4 + ORDER_BIAS[code], reverse=True)
+        else:
+            moves.sort(key=ORDER_BIAS.__getitem__, reverse=True)
+        tt_move = self._pv_moves.get(game.hash)
+        if tt_move is None and entry is not None and entry[3] >= 0:
+            tt_move = entry[3]
+        first = self.killers[ply][::-1] if self.use_killers else []
+        first.append(tt_move)
+        for code in first:
+            if code is not None and code >= 0 and code in moves:
+                moves.remove(code)
+                moves.insert(0, code)
+        return moves
@@ -0,0 +1,153 @@
+# analyse.py
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+from ai import MAX_PLY
+from arena import parse_engine, create_engine
+from fianco_game import FiancoGame, convert_move_to_notation
+from game_record import read_games, format_move
+
+# A move losing at least this much evaluation (one piece of material) is flagged as a blunder
+BLUNDER_THRESHOLD = 10.0
+
+# Games queued per worker process: enough to keep the pool busy, few enough that the
+# archive is streamed rather than read into memory
+IN_FLIGHT_PER_PROCESS = 4
+
+COLUMNS = ('game', 'ply', 'player', 'move', 'eval', 'best', 'loss', 'blunder')
+
+_engine = None  # The AIPlayer of a pool worker
+
+
+def _init_worker(engine):
+    global _engine
+    _engine = create_engine(engine)
+
+
+def analyse_game(task):
+    """
+    Search every position of one game. Runs in a pool worker.
+    Returns (game index, lines, blunders), one tab-separated line per move:
+    game, ply, player, move, eval, best, loss, blunder. eval is the position before the
+    move from White's point of view; loss is how much worse the move is than the best
+    move by the search's own values (0 for the best move). Engines that value every root
+    move (MCTSPlayer.move_values) compare the two moves within the same search, as their
+    values of different positions are not comparable.
+    """
+    index, record, threshold = task
+    game = FiancoGame()
+
+    # Value of each position for the side to move, up to and including the final position
+    values, best_moves = [], []
+    played_values = []  # Value of the played move in the same search, if the engine gives one
+    for ply, move in enumerate(record.moves):
+        if not game.validate_move(move):
+            raise ValueError(f"game {index}: illegal move {convert_move_to_notation(move)} at ply {ply + 1}")
+        best_moves.append(_engine.get_move(game))
+        values.append(_engine.best_value)  # None for book and forced moves
+        searched = values[-1] is not None and hasattr(_engine, 'move_values')
+        played_values.append(_engine.move_values().get(move) if searched else None)
+        game.make_move(move)
+    if game.is_terminal():
+        values.append(game.evaluate())
+    else:
+        _engine.get_move(game)
+        values.append(_engine.best_value)
+    for ply in range(len(record.moves) - 1, -1, -1):
+        if values[ply] is None:
+            # Nothing was searched: the position is worth what the played move leads to
+            values[ply] = -values[ply + 1] if values[ply + 1] is not None else 0.0
+
+    lines, blunders = [], 0
+    for ply, move in enumerate(record.moves):
+        player = 1 if ply % 2 == 0 else 2
+        # The search's own choice loses nothing, even if the next search sees further
+        if move == best_moves[ply]:
+            loss = 0.0
+        elif played_values[ply] is not None:
+            loss = max(0.0, values[ply] - played_values[ply])
+        else:
+            loss = max(0.0, values[ply] + values[ply + 1])
+        blunder = loss >= threshold
+        blunders += blunder
+        white_eval = values[ply] if player == 1 else -values[ply]
+        best = format_move(best_moves[ply]) if best_moves[ply] else '-'
+        lines.append(f"{index}\t{ply + 1}\t{player}\t{format_move(move)}"
+                     f"\t{white_eval:.2f}\t{best}\t{loss:.2f}\t{int(blunder)}")
+    return index, lines, blunders
+
+
+def analyse_archive(paths, engine, processes=None, threshold=BLUNDER_THRESHOLD, out=sys.stdout, log=print):
+    """
+    Analyse every game of the given record files across a process pool, writing the
+    per-move lines to `out` in game order. Games are read lazily and at most
+    IN_FLIGHT_PER_PROCESS per process are pending at once, so archives of any size
+    are processed in constant memory.
+    Returns (games, moves, blunders).
+    """
+    totals = [0, 0, 0]  # games, moves, blunders
+    start = time.perf_counter()
+    pending = deque()
+
+    def collect():
+        _, lines, blunders = pending.popleft().get()
+        if lines:
+            out.write('\n'.join(lines) + '\n')
+        totals[0] += 1
+        totals[1] += len(lines)
+        totals[2] += blunders
+        if totals[0] % 100 == 0:
+            elapsed = time.perf_counter() - start
+            log(f"{totals[0]} games, {totals[1]} moves ({totals[1] / elapsed:.0f} positions/s), {totals[2]} blunders")
+
+    out.write('\t'.join(COLUMNS) + '\n')
+    limit = IN_FLIGHT_PER_PROCESS * (processes or os.cpu_count() or 1)
+    with Pool(processes, _init_worker, (engine,)) as pool:
+        records = (record for path in paths for record in read_games(path))
+        for index, record in enumerate(records):
+            pending.append(pool.apply_async(analyse_game, ((index, record, threshold),)))
+            while len(pending) >= limit or (pending and pending[0].ready()):
+                collect()
+        while pending:
+            collect()
+    return tuple(totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse every move of recorded Fianco games")
+    parser.add_argument('files', nargs='+', help="game record files (see game_record.py)")
+    parser.add_argument('--engine', default='depth=4', help="engine description as in arena.py, e.g. 'depth=6' or 'time=0.2'")
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--blunder', type=float, default=BLUNDER_THRESHOLD, help="evaluation loss flagged as a blunder")
+    parser.add_argument('--output', help="tab-separated per-move output (default: stdout)")
+    args = parser.parse_args()
+
+    try:
+        engine = parse_engine(args.engine)
+    except ValueError as e:
+        parser.error(str(e))
+    # MCTS has no depth: its time (or playouts) bounds every search
+    if engine.get('engine', 'alphabeta') == 'alphabeta':
+        if 'time' not in engine:
+            engine['time'] = float('inf')  # Fixed depth: never cut short by the clock
+        elif 'depth' not in engine:
+            engine['depth'] = MAX_PLY  # Fixed time: as deep as the time allows
+    log = lambda message: print(message, file=sys.stderr)
+    start = time.perf_counter()
+    out = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        games, moves, blunders = analyse_archive(args.files, engine, args.processes, args.blunder, out, log)
+    finally:
+        if args.output:
+            out.close()
+    elapsed = time.perf_counter() - start
+    log(f"{games} games, {moves} moves, {blunders} blunders in {elapsed:.1f}s "
+        f"({moves / elapsed if elapsed else 0:.0f} positions/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+# arena.py
+
+import argparse
+import math
+import random
+import time
+from multiprocessing import Pool
+from ai import AIPlayer
+from mcts import MCTSPlayer
+from fianco_game import FiancoGame, EVALUATION_VARIANTS
+from game_record import GameRecord, write_game
+
+# Games still running after this many plies are adjudicated as draws
+MAX_PLIES = 300
+
+# Engine types, chosen with the engine key of a description (alphabeta by default)
+ENGINES = {'alphabeta': AIPlayer, 'mcts': MCTSPlayer}
+
+# Result of a game from engine A's point of view
+WIN, DRAW, LOSS = 1.0, 0.5, 0.0
+
+
+def parse_engine(spec):
+    """
+    Parse an engine description such as 'name=deep,depth=6,time=0.2,eval=aggressive'
+    or 'name=mc,engine=mcts,time=0.2'. Keys other than name, engine, time and eval are
+    passed to the player class as keyword arguments (numbers and true/false are converted).
+    Engines are created inside pool workers, which cannot start processes of their own, so
+    MCTS engines must keep processes=1 (use more games in parallel instead).
+    Raises ValueError for an MCTS engine with processes > 1.
+    """
+    config = {'name': spec}
+    for item in filter(None, spec.split(',')):
+        key, _, value = item.partition('=')
+        if value.lower() in ('true', 'false'):
+            value = value.lower() == 'true'
+        else:
+            for convert in (int, float):
+                try:
+                    value = convert(value)
+                    break
+                except ValueError:
+                    pass
+        config[key] = value
+    if config.get('engine') == 'mcts' and config.get('processes', 1) != 1:
+        raise ValueError(f"{spec}: MCTS engines run inside pool workers and need processes=1")
+    return config
+
+
+def create_engine(config):
+    """
+    Build a player object from a parsed engine description.
+    """
+    options = {key: value for key, value in config.items() if key not in ('name', 'engine', 'time', 'eval')}
+    if 'time' in config:
+        options['time_limit'] = config['time']
+    if 'eval' in config:
+        options['eval_weights'] = EVALUATION_VARIANTS[config['eval']]
+    return ENGINES[config.get('engine', 'alphabeta')](**options)
+
+
+def random_opening(seed, plies):
+    """
+    The list of random legal moves that starts game pair `seed`.
+    Both games of a pair use the same opening with colours swapped.
+    """
+    rng = random.Random(seed)
+    game = FiancoGame()
+    moves = []
+    for _ in range(plies):
+        possible_moves = game.get_possible_moves(game.current_player)
+        if not possible_moves or game.is_terminal():
+            break
+        move = rng.choice(possible_moves)
+        game.make_move(move)
+        moves.append(move)
+    return moves
+
+
+def play_game(task):
+    """
+    Play one game between engines A and B. Runs in a pool worker.
+    Returns a result record: (game index, A's colour, A's score, plies, A seconds, B seconds, moves).
+    """
+    index, engine_a, engine_b, opening_plies, seed = task
+    a_color = 1 if index % 2 == 0 else 2
+    players = {a_color: create_engine(engine_a), 3 - a_color: create_engine(engine_b)}
+    clock = {1: 0.0, 2: 0.0}
+    game = FiancoGame()
+    for move in random_opening(seed + index // 2, opening_plies):
+        game.make_move(move)
+
+    while not game.is_terminal() and game.move_count < MAX_PLIES:
+        player = game.current_player
+        start = time.perf_counter()
+        move = players[player].get_move(game)
+        duration = time.perf_counter() - start
+        clock[player] += duration
+        game.player_time[player] += duration
+        game.make_move(move, duration)
+
+    winner = game.get_winner() if game.is_terminal() else None
+    score = DRAW if winner is None else (WIN if winner == a_color else LOSS)
+    return (index, a_color, score, game.move_count, clock[a_color], clock[3 - a_color], game.move_history)
+
+
+def score_to_elo(score):
+    """
+    Elo difference corresponding to an expected score.
+    """
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def elo_to_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def elo_estimate(wins, draws, losses):
+    """
+    Elo difference with a 95% confidence interval, from A's point of view.
+    Returns (elo, lower, upper).
+    """
+    games = wins + draws + losses
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    margin = 1.96 * math.sqrt(variance / games)
+    return score_to_elo(score), score_to_elo(score - margin), score_to_elo(score + margin)
+
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    """
+    Log-likelihood ratio of H1 (A is elo1 stronger) against H0 (elo0), using the
+    normal approximation of the trinomial score distribution.
+    """
+    games = wins + draws + losses
+    if not wins + losses or not games:
+        return 0.0
+    score = (wins + 0.5 * draws) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    if variance <= 0:
+        return 0.0
+    score0, score1 = elo_to_score(elo0), elo_to_score(elo1)
+    return games * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+
+def sprt_bounds(alpha, beta):
+    """
+    (lower, upper) LLR bounds: accept H0 below lower, H1 above upper.
+    """
+    return math.log(beta / (1 - alpha)), math.log((1 - beta) / alpha)
+
+
+def _players_and_result(record, engine_a, engine_b):
+    """
+    White's name, Black's name and the result (1-0, 0-1, 1/2-1/2) of a result record.
+    """
+    _, a_color, score = record[:3]
+    white, black = (engine_a['name'], engine_b['name']) if a_color == 1 else (engine_b['name'], engine_a['name'])
+    white_score = score if a_color == 1 else 1 - score
+    return white, black, {1.0: '1-0', 0.0: '0-1'}.get(white_score, '1/2-1/2')
+
+
+def format_record(record, engine_a, engine_b):
+    """
+    One tab-separated result line: index, white, black, result (1-0, 0-1, 1/2-1/2), plies, seconds.
+    """
+    index, _, _, plies, a_seconds, b_seconds, _ = record
+    white, black, result = _players_and_result(record, engine_a, engine_b)
+    return f"{index}\t{white}\t{black}\t{result}\t{plies}\t{a_seconds:.2f}\t{b_seconds:.2f}"
+
+
+def game_record(record, engine_a, engine_b):
+    """
+    The GameRecord of a played game, for the --games-file archive.
+    """
+    white, black, result = _players_and_result(record, engine_a, engine_b)
+    move_history = record[6]
+    return GameRecord({'Event': 'arena', 'Game': record[0], 'White': white, 'Black': black, 'Result': result},
+                      [move for _, move, _ in move_history], [duration for _, _, duration in move_history])
+
+
+def run_match(engine_a, engine_b, games, processes=None, opening_plies=4, seed=0,
+              sprt=None, output=None, games_file=None, log=print):
+    """
+    Play up to `games` games (colours alternating) across a process pool.
+    sprt: optional (elo0, elo1, alpha, beta); the match stops as soon as a hypothesis is accepted.
+    games_file: optional path the full game records are written to (see game_record.py).
+    Returns (wins, draws, losses) for engine A.
+    """
+    tasks = [(index, engine_a, engine_b, opening_plies, seed) for index in range(games)]
+    wins = draws = losses = 0
+    bounds = sprt_bounds(sprt[2], sprt[3]) if sprt else None
+    out = open(output, 'w') if output else None
+    games_out = open(games_file, 'w') if games_file else None
+    try:
+        with Pool(processes) as pool:
+            for record in pool.imap_unordered(play_game, tasks):
+                score = record[2]
+                wins += score == WIN
+                draws += score == DRAW
+                losses += score == LOSS
+                if out:
+                    out.write(format_record(record, engine_a, engine_b) + '\n')
+                if games_out:
+                    write_game(games_out, game_record(record, engine_a, engine_b))
+                played = wins + draws + losses
+                if sprt:
+                    llr = sprt_llr(wins, draws, losses, sprt[0], sprt[1])
+                    if llr <= bounds[0] or llr >= bounds[1]:
+                        log(f"SPRT: {'H1 accepted' if llr >= bounds[1] else 'H0 accepted'} "
+                            f"after {played} games (LLR {llr:.2f})")
+                        pool.terminate()
+                        break
+                if played % 10 == 0:
+                    log(f"{played} games: +{wins} ={draws} -{losses}")
+    finally:
+        if out:
+            out.close()
+        if games_out:
+            games_out.close()
+    return wins, draws, losses
+
+
+def report(engine_a, engine_b, wins, draws, losses, sprt=None):
+    """
+    Print the match summary: score, Elo difference with 95% interval and the SPRT state.
+    """
+    games = wins + draws + losses
+    print(f"{engine_a['name']} vs {engine_b['name']}: {games} games, +{wins} ={draws} -{losses}")
+    if games:
+        elo, lower, upper = elo_estimate(wins, draws, losses)
+        print(f"Elo difference: {elo:+.1f} (95% interval {lower:+.1f} .. {upper:+.1f})")
+    if sprt:
+        llr = sprt_llr(wins, draws, losses, sprt[0], sprt[1])
+        lower_bound, upper_bound = sprt_bounds(sprt[2], sprt[3])
+        print(f"SPRT [{sprt[0]}, {sprt[1]}]: LLR {llr:.2f} (bounds {lower_bound:.2f} .. {upper_bound:.2f})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless Fianco engine arena")
+    parser.add_argument('engine_a', help="e.g. 'name=new,depth=4,time=0.1'")
+    parser.add_argument('engine_b', help="e.g. 'name=old,depth=3,time=0.1,eval=material'")
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--opening-plies', type=int, default=4, help="random moves before the engines take over")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write one tab-separated result line per game")
+    parser.add_argument('--games-file', help="write the record of every game (moves and timings)")
+    parser.add_argument('--sprt', type=float, nargs=4, metavar=('ELO0', 'ELO1', 'ALPHA', 'BETA'),
+                        help="stop early once one hypothesis is accepted")
+    args = parser.parse_args()
+
+    try:
+        engine_a, engine_b = parse_engine(args.engine_a), parse_engine(args.engine_b)
+    except ValueError as e:
+        parser.error(str(e))
+    wins, draws, losses = run_match(engine_a, engine_b, args.games, args.processes, args.opening_plies,
+                                    args.seed, args.sprt, args.output, args.games_file)
+    report(engine_a, engine_b, wins, draws, losses, args.sprt)
+
+
+if __name__ == "__main__":
+    main()
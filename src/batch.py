@@ -0,0 +1,268 @@
+# batch.py
+
+import argparse
+import random
+import time
+import numpy as np
+from constants import BOARD_SIZE
+from fianco_game import FiancoGame, default_weights
+
+# Vectorized versions of the FiancoGame rules over stacks of positions.
+# boards: (N, 9, 9) int8 arrays (0 empty, 1 White, 2 Black); players: (N,) side to move.
+# Repetition is a property of the move history, not the board, so it is not detected here.
+
+# Quiet move directions in move generation order: sideways left, sideways right, forward
+QUIET_DIRECTIONS = ((0, -1), (0, 1), (None, 0))
+# Capture directions: left and right diagonal forward jumps
+CAPTURE_DIRECTIONS = (-1, 1)
+
+FEATURE_NAMES = ('material', 'advancement', 'centrality', 'mobility', 'threats')
+
+WIN_SCORE = 10000
+
+_ROWS = np.arange(BOARD_SIZE).reshape(BOARD_SIZE, 1)
+_COLS = np.arange(BOARD_SIZE).reshape(1, BOARD_SIZE)
+_ADVANCEMENT = [None, np.broadcast_to(BOARD_SIZE - 1 - _ROWS, (BOARD_SIZE, BOARD_SIZE)),
+                np.broadcast_to(_ROWS, (BOARD_SIZE, BOARD_SIZE))]
+_CENTRALITY = np.broadcast_to(4 - np.abs(4 - _COLS), (BOARD_SIZE, BOARD_SIZE))
+
+
+def _look(mask, di, dj):
+    """
+    Return out with out[..., i, j] = mask[..., i + di, j + dj], False off the board.
+    """
+    out = np.zeros_like(mask)
+    rows_out = slice(max(0, -di), BOARD_SIZE - max(0, di))
+    rows_in = slice(max(0, di), BOARD_SIZE - max(0, -di))
+    cols_out = slice(max(0, -dj), BOARD_SIZE - max(0, dj))
+    cols_in = slice(max(0, dj), BOARD_SIZE - max(0, -dj))
+    out[..., rows_out, cols_out] = mask[..., rows_in, cols_in]
+    return out
+
+
+def side_move_masks(boards, player):
+    """
+    Source-square masks of every move available to `player` (1 or 2) on each board,
+    ignoring the mandatory capture rule.
+    Returns (quiet, captures): bool arrays of shape (N, 3, 9, 9) and (N, 2, 9, 9),
+    one plane per direction in QUIET_DIRECTIONS / CAPTURE_DIRECTIONS order.
+    """
+    own = boards == player
+    opp = boards == 3 - player
+    empty = boards == 0
+    forward = -1 if player == 1 else 1
+    quiet = np.stack([own & _look(empty, forward if di is None else di, dj)
+                      for di, dj in QUIET_DIRECTIONS], axis=1)
+    captures = np.stack([own & _look(opp, forward, dj) & _look(empty, 2 * forward, 2 * dj)
+                         for dj in CAPTURE_DIRECTIONS], axis=1)
+    return quiet, captures
+
+
+def _move_counts(boards):
+    """
+    Per-side capture and quiet move counts, each an (N, 3) array indexed by player.
+    """
+    num_boards = len(boards)
+    captures = np.zeros((num_boards, 3), dtype=np.int32)
+    quiet = np.zeros((num_boards, 3), dtype=np.int32)
+    for player in (1, 2):
+        quiet_masks, capture_masks = side_move_masks(boards, player)
+        quiet[:, player] = quiet_masks.sum(axis=(1, 2, 3))
+        captures[:, player] = capture_masks.sum(axis=(1, 2, 3))
+    return captures, quiet
+
+
+def legal_move_masks(boards, players):
+    """
+    Legal move masks for the side to move on each board, with the mandatory capture
+    rule applied (quiet planes are cleared on boards where a capture exists).
+    Returns (quiet, captures) as in side_move_masks.
+    """
+    boards = np.asarray(boards, dtype=np.int8)
+    players = np.asarray(players)
+    white = side_move_masks(boards, 1)
+    black = side_move_masks(boards, 2)
+    is_white = (players == 1).reshape(-1, 1, 1, 1)
+    quiet = np.where(is_white, white[0], black[0])
+    captures = np.where(is_white, white[1], black[1])
+    quiet &= ~captures.any(axis=(1, 2, 3)).reshape(-1, 1, 1, 1)
+    return quiet, captures
+
+
+def masks_to_moves(quiet, captures, player):
+    """
+    Expand the masks of one board into a list of (start_i, start_j, end_i, end_j) moves,
+    in the same order as FiancoGame.get_possible_moves.
+    """
+    forward = -1 if player == 1 else 1
+    moves = []
+    for i, j in zip(*np.nonzero(captures.any(axis=0))):
+        for plane, dj in enumerate(CAPTURE_DIRECTIONS):
+            if captures[plane, i, j]:
+                moves.append((int(i), int(j), int(i) + 2 * forward, int(j) + 2 * dj))
+    for i, j in zip(*np.nonzero(quiet.any(axis=0))):
+        for plane, (di, dj) in enumerate(QUIET_DIRECTIONS):
+            if quiet[plane, i, j]:
+                moves.append((int(i), int(j), int(i) + (forward if di is None else di), int(j) + dj))
+    return moves
+
+
+def winners(boards, players, move_counts=None):
+    """
+    Winner of each board: 1 or 2, or 0 if the game is not decided.
+    Applies the FiancoGame.get_winner rules that depend only on the position:
+    promotion, elimination, and no legal moves for the side to move.
+    """
+    boards = np.asarray(boards, dtype=np.int8)
+    players = np.asarray(players)
+    captures, quiet = move_counts if move_counts is not None else _move_counts(boards)
+    rows = np.arange(len(boards))
+    winner = np.zeros(len(boards), dtype=np.int8)
+    no_moves = (captures[rows, players] + quiet[rows, players]) == 0
+    winner[no_moves] = 3 - players[no_moves]
+    winner[~(boards == 2).any(axis=(1, 2))] = 1
+    winner[~(boards == 1).any(axis=(1, 2))] = 2
+    winner[(boards[:, BOARD_SIZE - 1, :] == 2).any(axis=1)] = 2
+    winner[(boards[:, 0, :] == 1).any(axis=1)] = 1
+    return winner
+
+
+def evaluation_features(boards, move_counts=None):
+    """
+    The evaluate() feature vector of each board, White minus Black, as an (N, 5) float array
+    with columns FEATURE_NAMES. `threats` is the number of a side's pieces that can be captured.
+    """
+    boards = np.asarray(boards, dtype=np.int8)
+    captures, quiet = move_counts if move_counts is not None else _move_counts(boards)
+    white = boards == 1
+    black = boards == 2
+    features = np.empty((len(boards), len(FEATURE_NAMES)))
+    features[:, 0] = white.sum(axis=(1, 2)) - black.sum(axis=(1, 2))
+    features[:, 1] = (white * _ADVANCEMENT[1]).sum(axis=(1, 2)) - (black * _ADVANCEMENT[2]).sum(axis=(1, 2))
+    features[:, 2] = (white * _CENTRALITY).sum(axis=(1, 2)) - (black * _CENTRALITY).sum(axis=(1, 2))
+    # Mandatory captures: a side's moves are its captures if it has any
+    mobility = np.where(captures > 0, captures, quiet)
+    features[:, 3] = mobility[:, 1] - mobility[:, 2]
+    # A side's threatened pieces are the opponent's captures
+    features[:, 4] = captures[:, 2] - captures[:, 1]
+    return features
+
+
+def evaluate_batch(boards, players, weights=None):
+    """
+    Evaluate every board like FiancoGame.evaluate(): from the side to move's point of view,
+    +-10000 for decided games. Without weights, each board uses the weights evaluate()
+    uses by default for its number of pieces (including any loaded weight file).
+    Returns (scores, features, winner).
+    """
+    boards = np.asarray(boards, dtype=np.int8)
+    players = np.asarray(players)
+    counts = _move_counts(boards)
+    features = evaluation_features(boards, counts)
+    winner = winners(boards, players, counts)
+    if weights is None:
+        pieces = (boards != 0).sum(axis=(1, 2))
+        scores = (features * np.array(default_weights(), dtype=float)[pieces]).sum(axis=1)
+    else:
+        scores = features @ np.asarray(weights, dtype=float)
+    scores = np.where(players == 1, scores, -scores)
+    scores[winner == players] = WIN_SCORE
+    scores[(winner != 0) & (winner != players)] = -WIN_SCORE
+    return scores, features, winner
+
+
+def stack_positions(games):
+    """
+    Stack FiancoGame positions into (boards, players) arrays for the functions above.
+    """
+    boards = np.array([game.board for game in games], dtype=np.int8)
+    players = np.array([game.current_player for game in games], dtype=np.int8)
+    return boards, players
+
+
+def random_positions(count, seed=0, max_plies=80):
+    """
+    Play random legal moves from the start position and return `count` games at random plies.
+    """
+    rng = random.Random(seed)
+    games = []
+    while len(games) < count:
+        game = FiancoGame()
+        for _ in range(rng.randint(0, max_plies)):
+            moves = game.get_possible_moves(game.current_player)
+            if not moves or game.get_winner() is not None:
+                break
+            game.make_move(rng.choice(moves))
+        games.append(game)
+    return games
+
+
+def crowded_positions(count, seed=0):
+    """
+    Random boards holding more pieces than the start position (31 to 40), as can be set up
+    through FiancoGame.board, so the checks also cover piece counts no game reaches.
+    """
+    rng = random.Random(seed)
+    games = []
+    for _ in range(count):
+        squares = rng.sample(range(BOARD_SIZE * BOARD_SIZE), rng.randint(31, 40))
+        board = [[0] * BOARD_SIZE for _ in range(BOARD_SIZE)]
+        for index, sq in enumerate(squares):
+            board[sq // BOARD_SIZE][sq % BOARD_SIZE] = 1 + index % 2
+        game = FiancoGame()
+        game.current_player = rng.choice((1, 2))
+        game.board = board
+        games.append(game)
+    return games
+
+
+def check_against_game(count=2000, seed=0):
+    """
+    Compare the batched rules with FiancoGame on random positions, one in ten of them
+    crowded (see crowded_positions).
+    Returns the number of mismatching positions (0 when consistent).
+    """
+    crowded = count // 10
+    games = random_positions(count - crowded, seed) + crowded_positions(crowded, seed)
+    boards, players = stack_positions(games)
+    quiet, captures = legal_move_masks(boards, players)
+    scores, _, winner = evaluate_batch(boards, players)
+    mismatches = 0
+    for k, game in enumerate(games):
+        expected_moves = game.get_possible_moves(game.current_player)
+        moves = masks_to_moves(quiet[k], captures[k], game.current_player)
+        expected_winner = game.get_winner() or 0
+        if (moves != expected_moves or winner[k] != expected_winner
+                or abs(scores[k] - game.evaluate()) > 1e-9):
+            mismatches += 1
+    return mismatches
+
+
+def main():
+    """
+    Check the batched rules against FiancoGame and report throughput.
+    """
+    parser = argparse.ArgumentParser(description="Batched Fianco move generation and evaluation")
+    parser.add_argument('--check', type=int, default=2000, help="random positions to compare with FiancoGame")
+    parser.add_argument('--bench', type=int, default=100000, help="positions for the throughput run")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    mismatches = check_against_game(args.check, args.seed)
+    print(f"consistency: {args.check - mismatches}/{args.check} positions match FiancoGame")
+
+    boards, players = stack_positions(random_positions(min(args.bench, 1000), args.seed + 1))
+    repeat = max(1, args.bench // len(boards))
+    boards = np.tile(boards, (repeat, 1, 1))
+    players = np.tile(players, repeat)
+    start = time.perf_counter()
+    legal_move_masks(boards, players)
+    evaluate_batch(boards, players)
+    seconds = time.perf_counter() - start
+    print(f"throughput: {len(boards)} positions in {seconds:.2f}s ({len(boards) / seconds:.0f} positions/s)")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
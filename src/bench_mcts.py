@@ -0,0 +1,37 @@
+# bench_mcts.py
+
+import argparse
+import os
+from mcts import MCTSPlayer
+from positions import BENCHMARK_POSITIONS, benchmark_position
+
+
+def main():
+    """
+    Report playouts/sec, tree size and memory per node of MCTSPlayer for several process counts.
+    """
+    parser = argparse.ArgumentParser(description="Fianco Monte Carlo tree search report")
+    parser.add_argument('--time', type=float, default=2.0, help="seconds per search")
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"CPUs available: {os.cpu_count()}")
+    print(f"{'position':<12}{'procs':>6}{'playouts':>10}{'playouts/s':>12}{'nodes':>10}{'bytes/node':>11}"
+          f"{'speedup':>9}  move")
+    for name in BENCHMARK_POSITIONS:
+        game = benchmark_position(name)
+        baseline = None
+        for processes in args.processes:
+            with MCTSPlayer(time_limit=args.time, processes=processes, seed=args.seed) as player:
+                move = player.get_move(game)
+                rate = player.playouts_per_second
+                nodes = len(player.tree)
+                bytes_per_node = player.tree.memory_bytes() / nodes
+            baseline = baseline or rate
+            print(f"{name:<12}{processes:>6}{player.playouts:>10}{rate:>12.0f}{nodes:>10}{bytes_per_node:>11.1f}"
+                  f"{rate / baseline:>8.2f}x  {move}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# bench_parallel.py
+
+import argparse
+import os
+import sys
+import time
+from fianco_game import FiancoGame
+from parallel_search import ParallelAIPlayer
+from positions import BENCHMARK_POSITIONS, benchmark_position
+
+
+def forced_move_position():
+    """
+    A position where White's only legal move is the capture E4xG6.
+    """
+    board = [[0] * 9 for _ in range(9)]
+    board[5][4] = board[8][0] = 1
+    board[4][5] = board[1][0] = 2
+    game = FiancoGame()
+    game.board = board
+    return game
+
+
+def check_forced_move(workers=2, time_limit=2.0, moves=3):
+    """
+    Play a single-legal-move position several times in a row and return the longest
+    get_move() time: the main search returns at once, and the helpers must not keep it
+    waiting for results of jobs they skipped.
+    """
+    game = forced_move_position()
+    longest = 0.0
+    with ParallelAIPlayer(workers=workers, depth=20, time_limit=time_limit) as ai:
+        for _ in range(moves):
+            start = time.perf_counter()
+            ai.get_move(game)
+            longest = max(longest, time.perf_counter() - start)
+    return longest
+
+
+def main():
+    """
+    Report time-to-depth and nodes/sec of the Lazy SMP search for several worker counts,
+    or with --check, check that a forced move returns within the time limit.
+    """
+    parser = argparse.ArgumentParser(description="Fianco parallel search speedup report")
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--tt-size-mb', type=float, default=64)
+    parser.add_argument('--check', action='store_true',
+                        help="only check that a single-legal-move position returns within the time limit")
+    args = parser.parse_args()
+
+    if args.check:
+        time_limit = 2.0
+        seconds = check_forced_move(max(args.workers), time_limit)
+        print(f"forced move: longest get_move {seconds:.3f}s (limit {time_limit}s)")
+        if seconds > time_limit:
+            sys.exit("forced move exceeded the time limit")
+        return
+
+    print(f"CPUs available: {os.cpu_count()}")
+    print(f"{'position':<12}{'workers':>8}{'time(s)':>10}{'nodes':>11}{'nodes/s':>11}{'speedup':>9}")
+    for name in BENCHMARK_POSITIONS:
+        game = benchmark_position(name)
+        baseline = None
+        for workers in args.workers:
+            with ParallelAIPlayer(workers=workers, depth=args.depth, time_limit=float('inf'),
+                                  tt_size_mb=args.tt_size_mb) as ai:
+                start = time.perf_counter()
+                ai.get_move(game)
+                seconds = time.perf_counter() - start
+                nodes = ai.total_nodes
+            baseline = baseline or seconds
+            print(f"{name:<12}{workers:>8}{seconds:>10.3f}{nodes:>11}{nodes / seconds:>11.0f}"
+                  f"{baseline / seconds:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
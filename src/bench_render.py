@@ -0,0 +1,65 @@
+# bench_render.py
+
+import argparse
+import os
+import time
+
+# Render off-screen unless a display is requested
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+from ai import AIPlayer
+from constants import FPS
+from positions import benchmark_position
+from search_worker import SearchWorker
+from ui import GameUI
+
+# How the frames are drawn:
+#   uncached: everything re-rendered every frame, as before the rendering caches
+#   full: the whole window redrawn every frame from the cached board and text
+#   dirty: GameUI.render, which redraws only what changed
+MODES = ('uncached', 'full', 'dirty')
+
+
+def simulate(ui, mode, frames, frames_per_move):
+    """
+    Draw `frames` frames of a game where the human's clock runs and a move is played
+    every frames_per_move frames. Returns the CPU milliseconds per frame.
+    """
+    game = ui.game
+    start = time.process_time()
+    for frame in range(frames):
+        game.player_time[ui.human_player] += 1 / FPS
+        if frame and frame % frames_per_move == 0:
+            moves = game.get_possible_moves(game.current_player)
+            if moves and not game.is_terminal():
+                game.make_move(moves[frame % len(moves)], 1.0)
+        if mode == 'uncached':
+            ui._text_cache.clear()
+            ui.board_surface = ui._render_static_board()
+            ui.draw_board()
+            pygame.display.flip()
+        elif mode == 'full':
+            ui.render(force=True)
+        else:
+            ui.render()
+    return (time.process_time() - start) * 1000 / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GameUI frame time benchmark")
+    parser.add_argument('--frames', type=int, default=1200)
+    parser.add_argument('--frames-per-move', type=int, default=300, help="frames between moves (300 = 5s at 60 FPS)")
+    args = parser.parse_args()
+
+    with SearchWorker(AIPlayer, depth=1) as search_worker:
+        print(f"{'mode':<10}{'cpu ms/frame':>14}{'share of a 60 FPS frame':>26}")
+        for mode in MODES:
+            ui = GameUI(benchmark_position('middlegame'), 1, 2, search_worker)
+            ms = simulate(ui, mode, args.frames, args.frames_per_move)
+            print(f"{mode:<10}{ms:>14.3f}{ms * FPS / 10:>25.1f}%")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# bench_search.py
+
+import argparse
+import time
+from ai import AIPlayer
+from fianco_game import convert_move_to_notation
+from positions import BENCHMARK_POSITIONS, benchmark_position
+from search_stats import SearchStats
+
+
+# Search options that can be switched off and on to measure what they save
+SEARCH_FEATURES = ('quiescence', 'killers', 'history', 'pvs', 'aspiration', 'lmr', 'symmetry')
+
+
+def run_search(game, depth, **options):
+    """
+    Run one fixed-depth search and return (nodes, seconds).
+    """
+    nodes, seconds, _, _ = search_details(game, depth, **options)
+    return nodes, seconds
+
+
+def search_details(game, depth, **options):
+    """
+    Run one fixed-depth search and return (nodes, seconds, move, stats), where stats is the
+    SearchStats collector passed in the options (None without one).
+    """
+    ai = AIPlayer(depth=depth, time_limit=float('inf'), **options)
+    start = time.perf_counter()
+    move = ai.get_move(game)
+    return ai.nodes, time.perf_counter() - start, move, ai.stats
+
+
+def child_step_cost(game, in_place, repeat=20000):
+    """
+    Return the average cost in microseconds of producing one child position, either with
+    make_move/undo_move on the same game or with clone() plus make_move.
+    """
+    moves = game.get_possible_moves(game.current_player)
+    start = time.perf_counter()
+    for _ in range(repeat // len(moves) + 1):
+        for move in moves:
+            if in_place:
+                game.make_move(move)
+                game.undo_move()
+            else:
+                game.clone().make_move(move)
+    return (time.perf_counter() - start) * 1e6 / ((repeat // len(moves) + 1) * len(moves))
+
+
+def compare_make_unmake(depth):
+    """
+    Compare nodes/sec of the clone-per-node and in-place (make/undo) search paths.
+    """
+    print(f"{'position':<12}{'moves':>6}{'mode':>10}{'nodes':>10}{'time(s)':>10}{'nodes/s':>12}{'child(us)':>11}")
+    for name in BENCHMARK_POSITIONS:
+        game = benchmark_position(name)
+        rates = {}
+        for mode, in_place in (('clone', False), ('in-place', True)):
+            nodes, seconds = run_search(game, depth, in_place=in_place)
+            rates[mode] = nodes / seconds
+            step = child_step_cost(game, in_place)
+            print(f"{name:<12}{game.move_count:>6}{mode:>10}{nodes:>10}{seconds:>10.3f}{rates[mode]:>12.0f}{step:>11.2f}")
+        print(f"{'':<12}{'':>6}{'speedup':>10}{rates['in-place'] / rates['clone']:>32.2f}x")
+
+
+def compare_feature(feature, depths):
+    """
+    Search every benchmark position with a search feature off and on, at each depth,
+    and report node counts, the share of cutoffs caused by the first move, time and the chosen move.
+    """
+    print(f"{'position':<12}{'depth':>6}{feature:>12}{'nodes':>10}{'qnodes':>10}{'first cut':>11}{'time(s)':>10}  move")
+    totals = {}
+    for name in BENCHMARK_POSITIONS:
+        game = benchmark_position(name)
+        for depth in depths:
+            for enabled in (False, True):
+                nodes, seconds, move, stats = search_details(game, depth, stats=SearchStats(), **{feature: enabled})
+                total = totals.setdefault((depth, enabled), [0, 0.0, 0, 0])
+                total[0] += nodes
+                total[1] += seconds
+                total[2] += stats.first_move_cutoffs
+                total[3] += stats.cutoffs
+                first_cut = stats.as_dict()['first_move_cutoff_rate']
+                print(f"{name:<12}{depth:>6}{'on' if enabled else 'off':>12}{nodes:>10}{stats.qnodes:>10}"
+                      f"{first_cut:>11.1%}{seconds:>10.3f}  {convert_move_to_notation(move)}")
+    for (depth, enabled), (nodes, seconds, first_cutoffs, cutoffs) in sorted(totals.items()):
+        print(f"{'total':<12}{depth:>6}{'on' if enabled else 'off':>12}{nodes:>10}{'':>10}"
+              f"{first_cutoffs / max(cutoffs, 1):>11.1%}{seconds:>10.3f}")
+
+
+def collect_stats(depth, log_path=None, profile_dir=None):
+    """
+    Search every benchmark position with a statistics collector attached and print
+    the main counters (also logged as JSON lines to log_path, if given).
+    """
+    print(f"{'position':<12}{'nodes':>10}{'nodes/s':>10}{'tt hit':>8}{'first cut':>11}{'ebf':>7}  time breakdown")
+    for name in BENCHMARK_POSITIONS:
+        stats = SearchStats(log_path, profile_dir and f"{profile_dir}/{name}")
+        search_details(benchmark_position(name), depth, stats=stats)
+        record = stats.as_dict()
+        ebf = record['depths'][-1]['ebf'] if record['depths'] else None
+        breakdown = ' '.join(f"{function}={seconds:.2f}s" for function, seconds in
+                             sorted(record['time_breakdown'].items(), key=lambda item: -item[1]))
+        print(f"{name:<12}{record['nodes']:>10}{record['nodes_per_second']:>10.0f}{record['tt_hit_rate']:>8.1%}"
+              f"{record['first_move_cutoff_rate']:>11.1%}{ebf or 0:>7.2f}  {breakdown}")
+
+
+def main():
+    """
+    Search benchmarks on the benchmark positions: clone versus make/undo by default,
+    the node savings of a search feature with --feature, or search statistics with --stats.
+    """
+    parser = argparse.ArgumentParser(description="Fianco search benchmark")
+    parser.add_argument('--depth', type=int, nargs='+', default=[3])
+    parser.add_argument('--feature', choices=SEARCH_FEATURES,
+                        help="compare node counts with this search feature off and on")
+    parser.add_argument('--stats', action='store_true', help="report search statistics of each position")
+    parser.add_argument('--stats-log', help="append the statistics to this JSON-lines file")
+    parser.add_argument('--profile', metavar='DIR', help="with --stats, write cProfile dumps of each search to DIR")
+    args = parser.parse_args()
+
+    if args.feature:
+        compare_feature(args.feature, args.depth)
+    elif args.stats:
+        collect_stats(args.depth[0], args.stats_log, args.profile)
+    else:
+        compare_make_unmake(args.depth[0])
+
+
+if __name__ == "__main__":
+    main()
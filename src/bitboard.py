@@ -0,0 +1,245 @@
+# bitboard.py
+
+from constants import BOARD_SIZE
+
+# Square numbering: square = row * BOARD_SIZE + col, so A9 (row 0, col 0) is bit 0
+# and I1 (row 8, col 8) is bit 80. A side's pieces are one Python int with one bit per square.
+NUM_SQUARES = BOARD_SIZE * BOARD_SIZE
+FULL = (1 << NUM_SQUARES) - 1
+
+ROW_MASKS = [((1 << BOARD_SIZE) - 1) << (row * BOARD_SIZE) for row in range(BOARD_SIZE)]
+FILE_MASKS = [sum(1 << (row * BOARD_SIZE + col) for row in range(BOARD_SIZE)) for col in range(BOARD_SIZE)]
+
+NOT_FILE_A = FULL & ~FILE_MASKS[0]
+NOT_FILE_I = FULL & ~FILE_MASKS[BOARD_SIZE - 1]
+
+# Promotion rows: White wins on row 0, Black wins on row 8
+GOAL_MASKS = [0, ROW_MASKS[0], ROW_MASKS[BOARD_SIZE - 1]]
+
+# Forward step (in squares) for each player; White moves up the board (towards row 0)
+FORWARD = [0, -BOARD_SIZE, BOARD_SIZE]
+
+
+def square(i, j):
+    """
+    Convert (row, col) coordinates to a square index.
+    """
+    return i * BOARD_SIZE + j
+
+
+def shift(bits, delta):
+    """
+    Shift a bitboard by delta squares (positive = towards row 8), dropping bits that leave the board.
+    """
+    if delta > 0:
+        return (bits << delta) & FULL
+    return bits >> -delta
+
+
+def _on_board(i, j):
+    return 0 <= i < BOARD_SIZE and 0 <= j < BOARD_SIZE
+
+
+def _build_tables():
+    """
+    Precompute per-square step and capture tables for both players.
+    Entries are listed in the same order as the original move generator
+    (sideways left, sideways right, forward; then left and right diagonal captures).
+    """
+    step_table = [None, [], []]
+    step_masks = [None, [], []]
+    capture_table = [None, [], []]
+    capture_masks = [None, [], []]
+    for player in (1, 2):
+        forward = -1 if player == 1 else 1
+        for sq in range(NUM_SQUARES):
+            i, j = divmod(sq, BOARD_SIZE)
+            steps = []
+            for di, dj in ((0, -1), (0, 1), (forward, 0)):
+                ni, nj = i + di, j + dj
+                if _on_board(ni, nj):
+                    steps.append((1 << square(ni, nj), (i, j, ni, nj)))
+            step_table[player].append(tuple(steps))
+            step_masks[player].append(sum(bit for bit, _ in steps))
+
+            captures = []
+            for di, dj in ((forward, -1), (forward, 1)):
+                mi, mj = i + di, j + dj
+                ei, ej = i + 2 * di, j + 2 * dj
+                if _on_board(mi, mj) and _on_board(ei, ej):
+                    captures.append((1 << square(mi, mj), 1 << square(ei, ej), (i, j, ei, ej)))
+            capture_table[player].append(tuple(captures))
+            capture_masks[player].append(sum(end_bit for _, end_bit, _ in captures))
+    return step_table, step_masks, capture_table, capture_masks
+
+
+STEP_TABLE, STEP_MASKS, CAPTURE_TABLE, CAPTURE_MASKS = _build_tables()
+
+# Squares a piece must stand on to be able to jump in each diagonal direction,
+# paired with the square offset of the jumped-over piece (the landing square is twice as far).
+_LEFT_JUMP_FILES = FULL & ~(FILE_MASKS[0] | FILE_MASKS[1])
+_RIGHT_JUMP_FILES = FULL & ~(FILE_MASKS[BOARD_SIZE - 2] | FILE_MASKS[BOARD_SIZE - 1])
+_WHITE_JUMP_ROWS = FULL & ~(ROW_MASKS[0] | ROW_MASKS[1])
+_BLACK_JUMP_ROWS = FULL & ~(ROW_MASKS[BOARD_SIZE - 2] | ROW_MASKS[BOARD_SIZE - 1])
+CAPTURE_RAYS = [
+    None,
+    ((_LEFT_JUMP_FILES & _WHITE_JUMP_ROWS, -BOARD_SIZE - 1),
+     (_RIGHT_JUMP_FILES & _WHITE_JUMP_ROWS, -BOARD_SIZE + 1)),
+    ((_LEFT_JUMP_FILES & _BLACK_JUMP_ROWS, BOARD_SIZE - 1),
+     (_RIGHT_JUMP_FILES & _BLACK_JUMP_ROWS, BOARD_SIZE + 1)),
+]
+
+
+def capture_sources(own, opp, empty, player):
+    """
+    Return the bitboard of the player's pieces that have at least one capture available.
+    """
+    sources = 0
+    for origin_mask, delta in CAPTURE_RAYS[player]:
+        landing = shift(shift(own & origin_mask, delta) & opp, delta) & empty
+        sources |= shift(landing, -2 * delta)
+    return sources
+
+
+def step_sources(own, empty, player):
+    """
+    Return the bitboard of the player's pieces that have at least one quiet move available.
+    """
+    # A piece can step left onto an empty square unless it is on file A, and right unless on file I
+    sources = (((empty & NOT_FILE_I) << 1) & own) | (((empty & NOT_FILE_A) >> 1) & own)
+    sources |= shift(empty, -FORWARD[player]) & own
+    return sources
+
+
+def has_moves(own, opp, player):
+    """
+    Whether the player has any legal move, without generating them.
+    """
+    empty = FULL & ~(own | opp)
+    return bool(step_sources(own, empty, player) or capture_sources(own, opp, empty, player))
+
+
+def iter_squares(bits):
+    """
+    Yield the square index of every set bit, in ascending order.
+    """
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def generate_captures(own, opp, player, empty=None):
+    """
+    Generate only the capture moves of the player owning `own` (empty list if there are none).
+    """
+    if empty is None:
+        empty = FULL & ~(own | opp)
+    movers = capture_sources(own, opp, empty, player)
+    table = CAPTURE_TABLE[player]
+    moves = []
+    while movers:
+        low = movers & -movers
+        movers ^= low
+        for mid_bit, end_bit, move in table[low.bit_length() - 1]:
+            if mid_bit & opp and end_bit & empty:
+                moves.append(move)
+    return moves
+
+
+def generate_moves(own, opp, player):
+    """
+    Generate the legal moves for the player owning `own`, as (start_i, start_j, end_i, end_j) tuples.
+    Captures are mandatory: if any capture exists only captures are returned.
+    """
+    empty = FULL & ~(own | opp)
+    captures = generate_captures(own, opp, player, empty)
+    if captures:
+        return captures
+
+    movers = step_sources(own, empty, player)
+    table = STEP_TABLE[player]
+    moves = []
+    while movers:
+        low = movers & -movers
+        movers ^= low
+        for to_bit, move in table[low.bit_length() - 1]:
+            if to_bit & empty:
+                moves.append(move)
+    return moves
+
+
+def encode_move(move):
+    """
+    Pack a (start_i, start_j, end_i, end_j) move into a small int: from_square * 81 + to_square.
+    """
+    start_i, start_j, end_i, end_j = move
+    return (start_i * BOARD_SIZE + start_j) * NUM_SQUARES + end_i * BOARD_SIZE + end_j
+
+
+def decode_move(code):
+    """
+    Unpack a move encoded by encode_move back into a (start_i, start_j, end_i, end_j) tuple.
+    """
+    from_square, to_square = divmod(code, NUM_SQUARES)
+    return divmod(from_square, BOARD_SIZE) + divmod(to_square, BOARD_SIZE)
+
+
+# Every encoded move decoded once, so searches can keep moves as ints and look the tuple up
+MOVE_TUPLES = [decode_move(code) for code in range(NUM_SQUARES * NUM_SQUARES)]
+
+# The move tables again with encoded moves
+STEP_CODE_TABLE = [None] + [[tuple((to_bit, encode_move(move)) for to_bit, move in steps) for steps in STEP_TABLE[player]]
+                            for player in (1, 2)]
+CAPTURE_CODE_TABLE = [None] + [[tuple((mid_bit, end_bit, encode_move(move)) for mid_bit, end_bit, move in captures)
+                                for captures in CAPTURE_TABLE[player]] for player in (1, 2)]
+
+
+def generate_move_codes(own, opp, player, moves=None):
+    """
+    Same moves in the same order as generate_moves, encoded as ints (see encode_move).
+    moves: optional list to fill (it is cleared first), so callers can reuse buffers.
+    """
+    if moves is None:
+        moves = []
+    else:
+        moves.clear()
+    empty = FULL & ~(own | opp)
+    movers = capture_sources(own, opp, empty, player)
+    if movers:
+        table = CAPTURE_CODE_TABLE[player]
+        while movers:
+            low = movers & -movers
+            movers ^= low
+            for mid_bit, end_bit, code in table[low.bit_length() - 1]:
+                if mid_bit & opp and end_bit & empty:
+                    moves.append(code)
+        return moves
+
+    movers = step_sources(own, empty, player)
+    table = STEP_CODE_TABLE[player]
+    while movers:
+        low = movers & -movers
+        movers ^= low
+        for to_bit, code in table[low.bit_length() - 1]:
+            if to_bit & empty:
+                moves.append(code)
+    return moves
+
+
+def move_counts(own, opp, player):
+    """
+    Count the player's capture moves and quiet moves without generating them.
+    Every landing square in a direction's shifted target set is exactly one move,
+    so the counts are popcounts of a few shift/mask results.
+    Returns (captures, quiet); with mandatory captures the number of legal moves is
+    captures if captures else quiet.
+    """
+    empty = FULL & ~(own | opp)
+    captures = 0
+    for origin_mask, delta in CAPTURE_RAYS[player]:
+        captures += (shift(shift(own & origin_mask, delta) & opp, delta) & empty).bit_count()
+    quiet = ((((empty & NOT_FILE_I) << 1) & own).bit_count()
+             + (((empty & NOT_FILE_A) >> 1) & own).bit_count()
+             + (shift(empty, -FORWARD[player]) & own).bit_count())
+    return captures, quiet
@@ -0,0 +1,106 @@
+# book_builder.py
+
+import argparse
+import math
+import random
+from ai import AIPlayer
+from bitboard import encode_move
+from fianco_game import FiancoGame, convert_move_to_notation
+from opening_book import OpeningBook, write_book
+from symmetry import MOVE_MAPS, canonical_key
+
+
+def _search_value(ai, game):
+    """
+    Search score of a position for the player to move (following forced moves).
+    """
+    if game.is_terminal():
+        return game.evaluate()
+    moves = game.get_possible_moves(game.current_player)
+    if len(moves) == 1:
+        game.make_move(moves[0])
+        value = -_search_value(ai, game)
+        game.undo_move()
+        return value
+    ai.get_move(game)
+    return ai.best_value
+
+
+def candidate_moves(ai, game, margin):
+    """
+    Score every legal move with a search and keep those within `margin` of the best.
+    Returns a list of (move, score), best first.
+    """
+    scored = []
+    for move in game.get_possible_moves(game.current_player):
+        game.make_move(move)
+        scored.append((move, -_search_value(ai, game)))
+        game.undo_move()
+    scored.sort(key=lambda item: item[1], reverse=True)
+    best = scored[0][1]
+    return [(move, score) for move, score in scored if score >= best - margin]
+
+
+def build_book(games=100, plies=8, depth=3, time_limit=5.0, margin=1.0, temperature=1.0, seed=0, log=print):
+    """
+    Build book statistics by self-play from the start position.
+    At each of the first `plies` moves every legal move is scored by a search, and one of the
+    moves within `margin` of the best is played (chosen with softmax weights at the given
+    temperature) so games spread over different lines. Each played move is counted as a
+    visit of that book move, so book lookups favour the moves self-play preferred.
+    Positions are keyed on their canonical image (see symmetry.py), so mirrored lines
+    share their statistics.
+    Returns {(key, move_code): [visits, total_score]}.
+    """
+    rng = random.Random(seed)
+    ai = AIPlayer(depth=depth, time_limit=time_limit)
+    candidates_cache = {}
+    stats = {}
+    for game_number in range(games):
+        game = FiancoGame()
+        for _ in range(plies):
+            if game.is_terminal():
+                break
+            if game.hash not in candidates_cache:
+                candidates_cache[game.hash] = candidate_moves(ai, game, margin)
+            candidates = candidates_cache[game.hash]
+            best = candidates[0][1]
+            weights = [math.exp((score - best) / temperature) for _, score in candidates]
+            move, score = rng.choices(candidates, weights=weights)[0]
+            key, symmetry = canonical_key(game.symmetric_hash)
+            entry = stats.setdefault((key, MOVE_MAPS[symmetry][encode_move(move)]), [0, 0.0])
+            entry[0] += 1
+            entry[1] += score
+            game.make_move(move)
+        log(f"game {game_number + 1}/{games}: {len(candidates_cache)} positions, {len(stats)} book moves")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect a Fianco opening book")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="build a book by self-play")
+    build.add_argument('path')
+    build.add_argument('--games', type=int, default=100)
+    build.add_argument('--plies', type=int, default=8)
+    build.add_argument('--depth', type=int, default=3)
+    build.add_argument('--time-limit', type=float, default=5.0)
+    build.add_argument('--margin', type=float, default=1.0, help="keep moves scoring within this of the best")
+    build.add_argument('--seed', type=int, default=0)
+    show = subparsers.add_parser('show', help="print the book moves of the start position")
+    show.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        stats = build_book(args.games, args.plies, args.depth, args.time_limit, args.margin, seed=args.seed)
+        write_book(args.path, stats)
+        print(f"wrote {len(stats)} records to {args.path}")
+    else:
+        book = OpeningBook(args.path)
+        print(f"{book.num_records} records")
+        for move, visits, score in book.entries(FiancoGame()):
+            print(f"{convert_move_to_notation(move)}  visits {visits:g}  score {score:.2f}")
+
+
+if __name__ == "__main__":
+    main()
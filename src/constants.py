@@ -1,7 +1,5 @@
 # constants.py
 
-import pygame
-
 # Game Constants
 BOARD_SIZE = 9
 
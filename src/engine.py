@@ -0,0 +1,222 @@
+# engine.py
+
+import sys
+import threading
+import time
+from ai import AIPlayer, MAX_PLY
+from fianco_game import FiancoGame, EVALUATION_VARIANTS
+from game_record import format_move, parse_move
+
+# Line-based engine protocol on stdin/stdout, in the spirit of UCI. Moves are FROM-TO
+# tokens (e.g. D1-D2), times are in milliseconds. Commands:
+#
+#   fep                                  -> id name ..., option ... lines, then fepok
+#   isready                              -> readyok (answered at once, even while searching)
+#   setoption name <name> value <value>  change an option (the engine starts a new game)
+#   newgame                              clear the transposition table and move ordering state
+#   position startpos [moves <m1> <m2> ...]
+#   position board <81 of . W B, row 9 first> <w|b> [moves ...]
+#   go [depth <n>] [movetime <ms>] [wtime <ms>] [btime <ms>] [infinite]
+#                                        -> info lines after each depth, then bestmove <m> [ponder <m>]
+#   stop                                 end the search now (it still sends its bestmove)
+#   quit
+#
+# The engine keeps one AIPlayer, so the transposition table persists across positions
+# and searches until newgame or setoption. Only the game and search modules are
+# imported (no pygame, no numpy), so the engine is ready within milliseconds.
+ENGINE_NAME = 'Fianco AI'
+
+# Protocol option name -> (AIPlayer keyword, type, default)
+OPTIONS = {
+    'Hash': ('tt_size_mb', int, 16),
+    'Quiescence': ('quiescence', bool, True),
+    'Book': ('book_path', str, ''),
+    'Tablebase': ('tablebase_path', str, ''),
+    'Cache': ('cache_path', str, ''),
+    'Eval': ('eval_weights', str, 'default'),
+}
+
+SQUARE_VALUES = {'.': 0, 'W': 1, 'B': 2}
+
+
+def _player_options(values):
+    """
+    AIPlayer keyword arguments for the protocol option values.
+    """
+    options = {}
+    for name, value in values.items():
+        keyword = OPTIONS[name][0]
+        if keyword == 'eval_weights':
+            value = EVALUATION_VARIANTS[value]
+        options[keyword] = value if value != '' else None
+    return options
+
+
+def parse_board(squares, side):
+    """
+    A FiancoGame set up from 81 characters (. W B, row 9 first) and the side to move (w or b).
+    """
+    if len(squares) != 81 or set(squares.upper()) - set(SQUARE_VALUES) or side not in ('w', 'b'):
+        raise ValueError("expected 81 squares of . W B and w or b")
+    game = FiancoGame()
+    game.current_player = 1 if side == 'w' else 2
+    game.board = [[SQUARE_VALUES[squares[i * 9 + j].upper()] for j in range(9)] for i in range(9)]
+    return game
+
+
+class Engine:
+    """
+    Protocol state: the current position, the player and the search thread.
+    """
+
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self._lock = threading.Lock()
+        self.option_values = {name: default for name, (_, _, default) in OPTIONS.items()}
+        self.player = AIPlayer(**_player_options(self.option_values))
+        self.game = FiancoGame()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def send(self, line):
+        with self._lock:
+            self.out.write(line + '\n')
+            self.out.flush()
+
+    def handle(self, line):
+        """
+        Execute one command line. Returns False after quit.
+        """
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == 'isready':
+            self.send('readyok')
+        elif command == 'stop':
+            self.stop()
+        elif command == 'quit':
+            self.stop()
+            return False
+        else:
+            # Everything else waits for the search in progress
+            self.wait()
+            handler = getattr(self, 'cmd_' + command, None)
+            if handler is None:
+                self.send(f"info string unknown command {command}")
+            else:
+                try:
+                    handler(args)
+                except (ValueError, KeyError, IndexError) as e:
+                    self.send(f"info string error: {command}: {e}")
+        return True
+
+    def cmd_fep(self, args):
+        self.send(f"id name {ENGINE_NAME}")
+        for name, (_, kind, default) in OPTIONS.items():
+            kind_name = {int: 'spin', bool: 'check', str: 'string'}[kind]
+            self.send(f"option name {name} type {kind_name} default {str(default).lower() if kind is bool else default}")
+        self.send('fepok')
+
+    def cmd_setoption(self, args):
+        if args[:1] != ['name'] or 'value' not in args:
+            raise ValueError("expected setoption name <name> value <value>")
+        split = args.index('value')
+        name, value = ' '.join(args[1:split]), ' '.join(args[split + 1:])
+        kind = OPTIONS[name][1]
+        if kind is bool:
+            value = value.lower() == 'true'
+        elif kind is int:
+            value = int(value)
+        elif name == 'Eval' and value not in EVALUATION_VARIANTS:
+            raise ValueError(f"unknown evaluation {value!r} ({', '.join(EVALUATION_VARIANTS)})")
+        values = dict(self.option_values, **{name: value})
+        self.player = AIPlayer(**_player_options(values))
+        self.option_values = values
+
+    def cmd_newgame(self, args):
+        self.player.new_game()
+        self.game = FiancoGame()
+
+    def cmd_position(self, args):
+        if args[:1] == ['startpos']:
+            game, rest = FiancoGame(), args[1:]
+        elif args[:1] == ['board'] and len(args) >= 3:
+            game, rest = parse_board(args[1], args[2]), args[3:]
+        else:
+            raise ValueError("expected startpos or board <squares> <side>")
+        if rest and rest[0] != 'moves':
+            raise ValueError(f"unexpected {rest[0]!r}")
+        for token in rest[1:]:
+            move = parse_move(token)
+            if not game.validate_move(move):
+                raise ValueError(f"illegal move {token}")
+            game.make_move(move)
+        self.game = game
+
+    def cmd_go(self, args):
+        params = {}
+        index = 0
+        while index < len(args):
+            key = args[index]
+            if key == 'infinite':
+                params[key] = True
+                index += 1
+            elif key in ('depth', 'movetime', 'wtime', 'btime'):
+                params[key] = int(args[index + 1])
+                index += 2
+            else:
+                raise ValueError(f"unknown go parameter {key!r}")
+        player = self.player
+        game = self.game.clone()
+        infinite = 'infinite' in params
+        clock = None if infinite else params.get('wtime' if game.current_player == 1 else 'btime')
+        player.depth = params.get('depth', MAX_PLY)
+        player.time_limit = params['movetime'] / 1000 if 'movetime' in params and not infinite else float('inf')
+        player.time_manager.total_time = clock / 1000 if clock is not None else None
+        if clock is not None:
+            game.player_time = {1: 0, 2: 0}  # The clock given is what remains
+        self._stop.clear()
+        player.stop_event = self._stop
+        player.on_iteration = self._report
+        self._search_start = time.perf_counter()
+        self._thread = threading.Thread(target=self._search, args=(game,), daemon=True)
+        self._thread.start()
+
+    def _report(self, depth, move, value, nodes):
+        ms = max(1, int((time.perf_counter() - self._search_start) * 1000))
+        pv = ' '.join(format_move(m) for m in self.player.principal_variation) or format_move(move)
+        self.send(f"info depth {depth} score {value + 0.0:.2f} nodes {nodes} nps {nodes * 1000 // ms} time {ms} pv {pv}")
+
+    def _search(self, game):
+        if game.is_terminal():
+            self.send('bestmove none')
+            return
+        move = self.player.get_move(game)
+        if move is None:
+            self.send('bestmove none')
+            return
+        pv = self.player.principal_variation
+        ponder = f" ponder {format_move(pv[1])}" if len(pv) >= 2 and pv[0] == move else ''
+        self.send(f"bestmove {format_move(move)}{ponder}")
+
+    def stop(self):
+        self._stop.set()
+        self.wait()
+
+    def wait(self):
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def main():
+    engine = Engine()
+    for line in sys.stdin:
+        if not engine.handle(line):
+            break
+    engine.stop()
+
+
+if __name__ == "__main__":
+    main()
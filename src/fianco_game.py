@@ -1,7 +1,11 @@
 # fianco_game.py
 
-import numpy as np
+import json
+import os
 from constants import BOARD_SIZE
+from bitboard import NUM_SQUARES, GOAL_MASKS, generate_moves, generate_captures, has_moves, iter_squares, move_counts
+from zobrist import ZOBRIST_PIECES, ZOBRIST_BLACK_TO_MOVE, compute_hash
+from symmetry import SYMMETRIC_PIECES, SYMMETRIC_BLACK_TO_MOVE, compute_symmetric_hash
 
 def convert_move_to_notation(move):
     """
@@ -13,21 +17,109 @@ def convert_move_to_notation(move):
     end = chr(end_j + ord('A')) + str(9 - end_i)
     return f"{start} {end}"
 
+def parse_notation(notation):
+    """
+    Convert standard notation back to a move tuple.
+    E.g., 'A1 A2' -> (start_i, start_j, end_i, end_j)
+    """
+    start, end = notation.split()
+    return (9 - int(start[1:]), ord(start[0].upper()) - ord('A'),
+            9 - int(end[1:]), ord(end[0].upper()) - ord('A'))
+
+# Per-square positional terms of evaluate(), in whole units: rows advanced towards the
+# promotion row (weighted 0.5) and central control (weighted 0.3). FiancoGame keeps their
+# per-side sums up to date in make_move/undo_move.
+ADVANCEMENT_UNITS = [
+    None,
+    [BOARD_SIZE - 1 - sq // BOARD_SIZE for sq in range(NUM_SQUARES)],
+    [sq // BOARD_SIZE for sq in range(NUM_SQUARES)],
+]
+CENTRALITY_UNITS = [4 - abs(4 - sq % BOARD_SIZE) for sq in range(NUM_SQUARES)]
+
+# Weights of the evaluation terms, each taken as White minus Black:
+# (material, advancement, centrality, mobility, threatened pieces)
+DEFAULT_WEIGHTS = (10, 0.5, 0.3, 0.5, -5)
+
+# Named weight sets that engines can be configured with (e.g. in the arena). 'default' is
+# None: evaluate() then uses its default weights, the per-phase tables of a loaded weight
+# file if there is one (see load_weights), else DEFAULT_WEIGHTS.
+EVALUATION_VARIANTS = {
+    'default': None,
+    'material': (10, 0, 0, 0, 0),
+    'aggressive': (10, 1.0, 0.3, 0.5, -3),
+    'cautious': (10, 0.5, 0.3, 0.5, -8),
+}
+
+# Game phases by the number of pieces left on the board (30 at the start). Positions set
+# up by hand can hold more, up to a full board; they count as openings.
+PHASE_NAMES = ('opening', 'middlegame', 'endgame')
+PIECE_PHASES = [0 if pieces > 20 else 1 if pieces > 10 else 2 for pieces in range(NUM_SQUARES + 1)]
+
+# Weights evaluate() uses when none are given, indexed by the number of pieces on the board.
+# All DEFAULT_WEIGHTS unless a weight file is loaded; the FIANCO_WEIGHTS environment
+# variable names one to load at startup.
+_phase_weights = [DEFAULT_WEIGHTS] * (NUM_SQUARES + 1)
+
+
+def load_weights(path):
+    """
+    Load a weight file written by tune.py and make its weights (per game phase, if it has
+    them) the ones evaluate() uses by default, and so the 'default' evaluation variant. The
+    overall weights are also registered as the 'tuned' variant: one flat table for every
+    phase, to compare with the per-phase tables. Returns the overall weights.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    weights = tuple(data['weights'])
+    phases = data.get('phases') or {}
+    by_phase = [tuple(phases.get(name, weights)) for name in PHASE_NAMES]
+    _phase_weights[:] = [by_phase[phase] for phase in PIECE_PHASES]
+    EVALUATION_VARIANTS['tuned'] = weights
+    return weights
+
+
+def default_weights():
+    """
+    The weights evaluate() uses when none are given, one set per number of pieces.
+    """
+    return tuple(_phase_weights)
+
+
+if os.environ.get('FIANCO_WEIGHTS'):
+    load_weights(os.environ['FIANCO_WEIGHTS'])
+
+# Value of FiancoGame._winner while the result of the position has not been computed
+_UNKNOWN = -1
+
 class FiancoGame:
     """
     Class representing the Fianco game logic.
     Handles the board state, move generation, move execution, and game rules.
+
+    The position is stored as one bitboard (an 81-bit int) per side in `pieces`;
+    `board` is a read-only 9x9 NumPy view rebuilt on demand for the UI.
+    `hash` is the 64-bit Zobrist key of the position and side to move, and
+    `symmetric_hash` packs the keys of its mirror and colour-swapped images
+    (see symmetry.py).
+    `advancement` and `centrality` hold each side's positional sums for evaluate().
+    Repetition (how many times in a row each side has played the same move) and the
+    result of the position are tracked through make_move/undo_move, so is_terminal()
+    and get_winner() do not depend on the length of the game.
     """
 
     def __init__(self):
         """
         Initialize the game board and state.
         """
-        self.board = np.zeros((BOARD_SIZE, BOARD_SIZE), dtype=int)
-        self._setup_board()
+        self.pieces = [0, 0, 0]  # Bitboards indexed by player: pieces[1] is White, pieces[2] is Black
+        self._board_cache = None
         self.current_player = 1  # 1 for White, 2 for Black
+        self._repeats = [0, 0, 0]  # Times in a row each player has played its last move
+        self._setup_board()
         self.move_count = 0
         self.move_history = []  # Stores tuples of (player, move_notation)
+        # Per move: (captured square or -1, mover's previous repeat count, previous cached winner)
+        self._undo_stack = []
         self.captured_pieces = {1: 0, 2: 0}  # Number of pieces captured by each player
         self.ai_time = 0  # Total time AI has taken
         self.player_time = {1: 0, 2: 0}  # Time taken by each player
@@ -36,67 +128,88 @@ class FiancoGame:
         """
         Set up the initial board configuration.
         """
+        board = [[0] * BOARD_SIZE for _ in range(BOARD_SIZE)]
         # Place black pieces at the top
-        self.board[0, :] = 2
-        self.board[1, [1, 7]] = 2
-        self.board[2, [2, 6]] = 2
-        self.board[3, [3, 5]] = 2
+        board[0] = [2] * BOARD_SIZE
+        for row in range(1, 4):
+            board[row][row] = board[row][BOARD_SIZE - 1 - row] = 2
 
         # Place white pieces at the bottom
-        self.board[8, :] = 1
-        self.board[7, [1, 7]] = 1
-        self.board[6, [2, 6]] = 1
-        self.board[5, [3, 5]] = 1
+        board[8] = [1] * BOARD_SIZE
+        for row in range(5, 8):
+            board[row][row] = board[row][BOARD_SIZE - 1 - row] = 1
+        self.board = board
+
+    @property
+    def board(self):
+        """
+        9x9 array view of the position (0 empty, 1 White, 2 Black).
+        Treat it as read-only; assign a whole new array to change the position.
+        """
+        if self._board_cache is None:
+            # Imported here so that engines that never look at the array start without numpy
+            import numpy as np
+            board = np.zeros(NUM_SQUARES, dtype=int)
+            for player in (1, 2):
+                for sq in iter_squares(self.pieces[player]):
+                    board[sq] = player
+            self._board_cache = board.reshape(BOARD_SIZE, BOARD_SIZE)
+        return self._board_cache
+
+    @board.setter
+    def board(self, board):
+        self.pieces = [0, 0, 0]
+        for i, row in enumerate(board):
+            for j, value in enumerate(row):
+                if value:
+                    self.pieces[int(value)] |= 1 << (i * BOARD_SIZE + j)
+        self._board_cache = None
+        self.hash = compute_hash(self.pieces, self.current_player)
+        self.symmetric_hash = compute_symmetric_hash(self.pieces, self.current_player)
+        self.advancement = [0, 0, 0]
+        self.centrality = [0, 0, 0]
+        for player in (1, 2):
+            for sq in iter_squares(self.pieces[player]):
+                self.advancement[player] += ADVANCEMENT_UNITS[player][sq]
+                self.centrality[player] += CENTRALITY_UNITS[sq]
+        self._winner = _UNKNOWN
 
     def clone(self):
         """
         Create a deep copy of the game state.
         Useful for AI to simulate moves without altering the actual game.
         """
-        clone_game = FiancoGame()
-        clone_game.board = np.copy(self.board)
+        clone_game = FiancoGame.__new__(FiancoGame)
+        clone_game.pieces = self.pieces.copy()
+        clone_game._board_cache = None
+        clone_game.hash = self.hash
+        clone_game.symmetric_hash = self.symmetric_hash
+        clone_game.advancement = self.advancement.copy()
+        clone_game.centrality = self.centrality.copy()
+        clone_game._repeats = self._repeats.copy()
+        clone_game._winner = self._winner
         clone_game.current_player = self.current_player
         clone_game.move_count = self.move_count
         clone_game.move_history = self.move_history.copy()
+        clone_game._undo_stack = self._undo_stack.copy()
         clone_game.captured_pieces = self.captured_pieces.copy()
+        clone_game.ai_time = self.ai_time
+        clone_game.player_time = self.player_time.copy()
         return clone_game
 
     def get_possible_moves(self, player):
         """
         Generate all possible moves for the given player.
         Returns a list of moves in the form (start_i, start_j, end_i, end_j).
+        Captures are mandatory: when any capture exists, only captures are returned.
         """
-        moves = []
-        captures = []
-        for i in range(BOARD_SIZE):
-            for j in range(BOARD_SIZE):
-                if self.board[i][j] == player:
-                    # Regular moves: sideways and forward
-                    directions = [(0, -1), (0, 1)]  # Sideways
-                    if player == 1:  # White moves up
-                        directions.append((-1, 0))
-                    else:  # Black moves down
-                        directions.append((1, 0))
-
-                    # Check for regular moves
-                    for di, dj in directions:
-                        new_i, new_j = i + di, j + dj
-                        if (0 <= new_i < BOARD_SIZE and 0 <= new_j < BOARD_SIZE and
-                                self.board[new_i][new_j] == 0):
-                            moves.append((i, j, new_i, new_j))
-
-                    # Check for captures (diagonal forward jumps)
-                    capture_directions = [(-1, -1), (-1, 1)] if player == 1 else [(1, -1), (1, 1)]
-                    for di, dj in capture_directions:
-                        mid_i, mid_j = i + di, j + dj
-                        end_i, end_j = i + 2 * di, j + 2 * dj
-                        if (0 <= mid_i < BOARD_SIZE and 0 <= mid_j < BOARD_SIZE and
-                                0 <= end_i < BOARD_SIZE and 0 <= end_j < BOARD_SIZE and
-                                self.board[mid_i][mid_j] == 3 - player and
-                                self.board[end_i][end_j] == 0):
-                            captures.append((i, j, end_i, end_j))
-        # Mandatory capture rule
-        return captures if captures else moves
+        return generate_moves(self.pieces[player], self.pieces[3 - player], player)
+
+    def get_captures(self, player):
+        """
+        Generate only the capture moves of the given player (empty list if there are none).
+        """
+        return generate_captures(self.pieces[player], self.pieces[3 - player], player)
 
     def make_move(self, move, move_duration=0):
         """
@@ -105,20 +218,42 @@ class FiancoGame:
         """
         start_i, start_j, end_i, end_j = move
         player = self.current_player
+        pieces = self.pieces
 
         # Move the piece
-        self.board[end_i][end_j] = self.board[start_i][start_j]
-        self.board[start_i][start_j] = 0
+        start, end = start_i * BOARD_SIZE + start_j, end_i * BOARD_SIZE + end_j
+        pieces[player] ^= (1 << start) | (1 << end)
+        keys = ZOBRIST_PIECES[player]
+        self.hash ^= keys[start] ^ keys[end] ^ ZOBRIST_BLACK_TO_MOVE
+        keys = SYMMETRIC_PIECES[player]
+        self.symmetric_hash ^= keys[start] ^ keys[end] ^ SYMMETRIC_BLACK_TO_MOVE
+        advancement = ADVANCEMENT_UNITS[player]
+        self.advancement[player] += advancement[end] - advancement[start]
+        self.centrality[player] += CENTRALITY_UNITS[end] - CENTRALITY_UNITS[start]
 
         # Check for capture
         if abs(start_i - end_i) == 2:
-            mid_i, mid_j = (start_i + end_i) // 2, (start_j + end_j) // 2
-            captured_piece = self.board[mid_i][mid_j]
-            self.board[mid_i][mid_j] = 0
+            captured_square = (start_i + end_i) // 2 * BOARD_SIZE + (start_j + end_j) // 2
+            opponent = 3 - player
+            pieces[opponent] &= ~(1 << captured_square)
+            self.hash ^= ZOBRIST_PIECES[opponent][captured_square]
+            self.symmetric_hash ^= SYMMETRIC_PIECES[opponent][captured_square]
+            self.advancement[opponent] -= ADVANCEMENT_UNITS[opponent][captured_square]
+            self.centrality[opponent] -= CENTRALITY_UNITS[captured_square]
             self.captured_pieces[player] += 1
+        else:
+            captured_square = -1
+        repeats = self._repeats
+        self._undo_stack.append((captured_square, repeats[player], self._winner))
+        self._board_cache = None
+        self._winner = _UNKNOWN
+
+        # The player's previous move is the one before the opponent's last move
+        history = self.move_history
+        repeats[player] = repeats[player] + 1 if len(history) >= 2 and history[-2][1] == move else 1
 
         # Record the move with duration (store move coordinates)
-        self.move_history.append((player, move, move_duration))
+        history.append((player, move, move_duration))
 
         # Update game state
         self.current_player = 3 - player  # Switch player
@@ -140,45 +275,41 @@ class FiancoGame:
 
         # Reverse the move
         start_i, start_j, end_i, end_j = last_move
-        self.board[start_i][start_j] = self.board[end_i][end_j]
-        self.board[end_i][end_j] = 0
+        pieces = self.pieces
+        start, end = start_i * BOARD_SIZE + start_j, end_i * BOARD_SIZE + end_j
+        pieces[last_player] ^= (1 << start) | (1 << end)
+        keys = ZOBRIST_PIECES[last_player]
+        self.hash ^= keys[start] ^ keys[end] ^ ZOBRIST_BLACK_TO_MOVE
+        keys = SYMMETRIC_PIECES[last_player]
+        self.symmetric_hash ^= keys[start] ^ keys[end] ^ SYMMETRIC_BLACK_TO_MOVE
+        advancement = ADVANCEMENT_UNITS[last_player]
+        self.advancement[last_player] -= advancement[end] - advancement[start]
+        self.centrality[last_player] -= CENTRALITY_UNITS[end] - CENTRALITY_UNITS[start]
 
         # If it was a capture, restore the captured piece
-        if abs(start_i - end_i) == 2:
-            mid_i, mid_j = (start_i + end_i) // 2, (start_j + end_j) // 2
-            self.board[mid_i][mid_j] = 3 - self.current_player  # Opponent's piece
-            self.captured_pieces[self.current_player] -= 1
+        captured_square, self._repeats[last_player], self._winner = self._undo_stack.pop()
+        if captured_square >= 0:
+            opponent = 3 - last_player
+            pieces[opponent] |= 1 << captured_square
+            self.hash ^= ZOBRIST_PIECES[opponent][captured_square]
+            self.symmetric_hash ^= SYMMETRIC_PIECES[opponent][captured_square]
+            self.advancement[opponent] += ADVANCEMENT_UNITS[opponent][captured_square]
+            self.centrality[opponent] += CENTRALITY_UNITS[captured_square]
+            self.captured_pieces[last_player] -= 1
+        self._board_cache = None
+
+    def _is_repetition(self):
+        """
+        Check whether the player who just moved has played the same move three times in a row.
+        """
+        return len(self.move_history) >= 6 and self._repeats[3 - self.current_player] >= 3
 
     def is_terminal(self):
         """
         Check if the game has reached a terminal state.
         Returns True if the game is over, False otherwise.
         """
-        # Check for victory by reaching the opposite side
-        if 1 in self.board[0, :]:
-            return True
-        if 2 in self.board[8, :]:
-            return True
-
-        # Check for victory by capturing all opponent's pieces
-        if not np.any(self.board == 1):
-            return True
-        if not np.any(self.board == 2):
-            return True
-
-        # Check if current player has no valid moves
-        if not self.get_possible_moves(self.current_player):
-            return True
-
-            # Check for three consecutive identical moves by the same player
-            # Check for three consecutive identical moves by the same player
-        if len(self.move_history) >= 6:
-            last_player = 3 - self.current_player  # Player who just moved
-            last_moves = [move for move in self.move_history if move[0] == last_player][-3:]
-            if len(last_moves) == 3 and all(move[1] == last_moves[0][1] for move in last_moves):
-                return True
-
-        return False
+        return self.get_winner() is not None
 
     def get_winner(self):
         """
@@ -187,34 +318,36 @@ class FiancoGame:
             - 1 if White wins
             - 2 if Black wins
             - None if no winner yet
+        The result is cached until the next make_move/undo_move.
+        """
+        winner = self._winner
+        if winner == _UNKNOWN:
+            winner = self._decided_winner()
+            player = self.current_player
+            # Check if current player has no moves
+            if winner is None and not has_moves(self.pieces[player], self.pieces[3 - player], player):
+                winner = 3 - player  # Opponent wins
+            self._winner = winner
+        return winner
+
+    def _decided_winner(self):
+        """
+        Winner by promotion, elimination or repetition, without looking at the moves left.
         """
-        if 1 in self.board[0, :]:
+        white, black = self.pieces[1], self.pieces[2]
+        if white & GOAL_MASKS[1]:
             return 1  # White wins
-        if 2 in self.board[8, :]:
+        if black & GOAL_MASKS[2]:
             return 2  # Black wins
-        if not np.any(self.board == 1):
+        if not white:
             return 2  # Black wins
-        if not np.any(self.board == 2):
+        if not black:
             return 1  # White wins
 
         # Check for repeated moves
-        if len(self.move_history) >= 6:
-            last_player = 3 - self.current_player  # Player who just moved
-            last_moves = [move for move in self.move_history if move[0] == last_player][-3:]
-            if len(last_moves) == 3 and all(move[1] == last_moves[0][1] for move in last_moves):
-                return 3 - last_player  # Opponent wins
-
-        # Check if current player has no moves
-        if not self.get_possible_moves(self.current_player):
-            return 3 - self.current_player  # Opponent wins
-
-        # Check for repeated moves
-        if len(self.move_history) >= 6:
-            last_player = 3 - self.current_player  # Player who just moved
-            last_moves = [move for move in self.move_history if move[0] == last_player][-3:]
-            if len(last_moves) == 3 and all(move[1] == last_moves[0][1] for move in last_moves):
-                return 3 - last_player  # Opponent wins
-        return None  # No winner yet
+        if self._is_repetition():
+            return self.current_player  # Opponent of the repeating player wins
+        return None
 
     def validate_move(self, move):
         """
@@ -222,69 +355,54 @@ class FiancoGame:
         """
         return move in self.get_possible_moves(self.current_player)
 
-    def evaluate(self):
+    def evaluate(self, weights=None):
+        """
+        Score the position for the player to move (+-10000 for a decided game).
+        weights: optional evaluation weights (see DEFAULT_WEIGHTS and load_weights).
+        Material and positional sums are maintained incrementally; mobility and threats
+        come from one counting pass per side (a side's threats are the opponent's captures).
+        """
+        player = self.current_player
         winner = self.get_winner()
-        if winner == self.current_player:
+        if winner == player:
             return 10000
-        elif winner == 3 - self.current_player:
+        elif winner is not None:
             return -10000
 
+        white_captures, white_quiet = move_counts(self.pieces[1], self.pieces[2], 1)
+        black_captures, black_quiet = move_counts(self.pieces[2], self.pieces[1], 2)
+        # Mandatory captures: a side's moves are its captures if it has any
+        white_mobility = white_captures or white_quiet
+        black_mobility = black_captures or black_quiet
+
         # Piece counts
-        white_pieces = np.argwhere(self.board == 1)
-        black_pieces = np.argwhere(self.board == 2)
-
-        white_score = len(white_pieces)
-        black_score = len(black_pieces)
-
-        # Positional scores
-        white_positional_score = 0
-        black_positional_score = 0
-
-        for pos in white_pieces:
-            i, j = pos
-            # Advancement bonus
-            advancement = (8 - i) * 0.5
-            # Central control bonus
-            centrality = (4 - abs(4 - j)) * 0.3
-            white_positional_score += advancement + centrality
-
-        for pos in black_pieces:
-            i, j = pos
-            # Advancement bonus
-            advancement = i * 0.5
-            # Central control bonus
-            centrality = (4 - abs(4 - j)) * 0.3
-            black_positional_score += advancement + centrality
-
-        # Mobility scores
-        white_mobility = len(self.get_possible_moves(1))
-        black_mobility = len(self.get_possible_moves(2))
+        white_score = self.pieces[1].bit_count()
+        black_score = self.pieces[2].bit_count()
+
+        material_weight, advancement_weight, centrality_weight, mobility_weight, threat_weight = (
+            weights or _phase_weights[white_score + black_score])
+
+        # Positional scores (advancement and central control)
+        white_positional_score = self.advancement[1] * advancement_weight + self.centrality[1] * centrality_weight
+        black_positional_score = self.advancement[2] * advancement_weight + self.centrality[2] * centrality_weight
 
         # Threats (pieces that can be captured)
-        white_threats = self._count_threats(1)
-        black_threats = self._count_threats(2)
+        white_threats = black_captures
+        black_threats = white_captures
 
         # Total evaluation
         score = (
-                (white_score - black_score) * 10
+                (white_score - black_score) * material_weight
                 + (white_positional_score - black_positional_score)
-                + (white_mobility - black_mobility) * 0.5
-                - (white_threats - black_threats) * 5
+                + (white_mobility - black_mobility) * mobility_weight
+                + (white_threats - black_threats) * threat_weight
         )
 
-        return score if self.current_player == 1 else -score
+        return score if player == 1 else -score
 
     def _count_threats(self, player):
         """
         Count the number of player's pieces that can be captured in the next turn.
         """
         opponent = 3 - player
-        threats = 0
-        opponent_moves = self.get_possible_moves(opponent)
-        for move in opponent_moves:
-            if abs(move[0] - move[2]) == 2:
-                # Check if the capture targets a player's piece
-                mid_i, mid_j = (move[0] + move[2]) // 2, (move[1] + move[3]) // 2
-                if self.board[mid_i][mid_j] == player:
-                    threats += 1
-        return threats
\ No newline at end of file
+        return move_counts(self.pieces[opponent], self.pieces[player], opponent)[0]
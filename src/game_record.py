@@ -0,0 +1,163 @@
+# game_record.py
+
+import re
+from fianco_game import FiancoGame, convert_move_to_notation, parse_notation
+
+# Game record text format, one game after another:
+#
+#   [White "engine-a"]
+#   [Black "human"]
+#   [Result "1-0"]
+#
+#   1. D1-D2 {0.84} F6-E6 {2.10} 2. F4-G4 {0.91} ...
+#   1-0
+#
+# Header lines are [Name "value"]. The movetext lists moves as FROM-TO squares, optionally
+# followed by the seconds spent on them in braces; move numbers are ignored when reading.
+# A result token (1-0, 0-1, 1/2-1/2, or * for an unfinished game) ends the game.
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+MOVES_PER_LINE = 8
+
+_HEADER = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]')
+_MOVE_NUMBER = re.compile(r'\d+\.$')
+_ESCAPE = re.compile(r'["\\]')
+_UNESCAPE = re.compile(r'\\(.)')
+
+
+def format_move(move):
+    """
+    A move tuple as a single FROM-TO token, e.g. 'D1-D2'.
+    """
+    return convert_move_to_notation(move).replace(' ', '-')
+
+
+def parse_move(token):
+    """
+    The move tuple of a FROM-TO token. Raises ValueError if it is not one.
+    """
+    start, separator, end = token.partition('-')
+    if not separator or not start[1:].isdigit() or not end[1:].isdigit():
+        raise ValueError(f"bad move {token!r}")
+    return parse_notation(f"{start} {end}")
+
+
+class GameRecord:
+    """
+    A recorded game: headers, moves (as move tuples) and the seconds spent on each move.
+    """
+
+    def __init__(self, headers=None, moves=None, durations=None):
+        self.headers = dict(headers or {})
+        self.moves = list(moves or [])
+        self.durations = list(durations) if durations is not None else [None] * len(self.moves)
+
+    @property
+    def result(self):
+        return self.headers.get('Result', '*')
+
+    @classmethod
+    def from_game(cls, game, **headers):
+        """
+        Record a FiancoGame. The Result header is filled in from the game unless given.
+        """
+        record = cls(headers, [move for _, move, _ in game.move_history],
+                     [duration for _, _, duration in game.move_history])
+        if 'Result' not in record.headers:
+            winner = game.get_winner() if game.is_terminal() else None
+            record.headers['Result'] = {1: '1-0', 2: '0-1'}.get(winner, '*')
+        return record
+
+    def to_game(self):
+        """
+        Replay the record into a new FiancoGame, checking every move.
+        """
+        game = FiancoGame()
+        for move, duration in zip(self.moves, self.durations):
+            if not game.validate_move(move):
+                raise ValueError(f"Illegal move {convert_move_to_notation(move)} at ply {game.move_count + 1}")
+            game.make_move(move, duration or 0)
+            if duration is not None:
+                game.player_time[3 - game.current_player] += duration
+        return game
+
+    def to_text(self):
+        """
+        The record in the text format, ending with a blank line.
+        """
+        lines = [f'[{name} "{_quote(value)}"]' for name, value in self.headers.items()]
+        lines.append('')
+        tokens = []
+        for ply, (move, duration) in enumerate(zip(self.moves, self.durations)):
+            if ply % 2 == 0:
+                tokens.append(f"{ply // 2 + 1}.")
+            tokens.append(format_move(move))
+            if duration is not None:
+                tokens.append(f"{{{duration:.2f}}}")
+            if ply % MOVES_PER_LINE == MOVES_PER_LINE - 1:
+                lines.append(' '.join(tokens))
+                tokens = []
+        tokens.append(self.result)
+        lines.append(' '.join(tokens))
+        lines.append('')
+        return '\n'.join(lines) + '\n'
+
+
+def _quote(value):
+    """
+    A header value with its quotes and backslashes escaped.
+    """
+    return _ESCAPE.sub(r'\\\g<0>', str(value))
+
+
+def write_game(f, record):
+    """
+    Append a record to an open text file.
+    """
+    f.write(record.to_text())
+
+
+def read_games(source):
+    """
+    Yield the games of a file (a path or an open text file) one at a time, so archives
+    of any size are read in constant memory. Raises ValueError on malformed input.
+    """
+    if isinstance(source, str):
+        with open(source) as f:
+            yield from read_games(f)
+        return
+    record = None
+    for line_number, line in enumerate(source, 1):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith('['):
+            match = _HEADER.fullmatch(line)
+            if match is None:
+                raise ValueError(f"line {line_number}: bad header {line!r}")
+            if record is not None and record.moves:
+                raise ValueError(f"line {line_number}: game without a result before {line!r}")
+            if record is None:
+                record = GameRecord()
+            record.headers[match.group(1)] = _UNESCAPE.sub(r'\1', match.group(2))
+            continue
+        if record is None:
+            record = GameRecord()
+        for token in line.split():
+            if token in RESULTS:
+                record.headers.setdefault('Result', token)
+                yield record
+                record = None
+                break
+            if token.startswith('{'):
+                if not record.moves or not token.endswith('}'):
+                    raise ValueError(f"line {line_number}: misplaced timing {token!r}")
+                record.durations[-1] = float(token[1:-1])
+            elif not _MOVE_NUMBER.match(token):
+                try:
+                    move = parse_move(token)
+                except ValueError:
+                    raise ValueError(f"line {line_number}: bad move {token!r}") from None
+                record.moves.append(move)
+                record.durations.append(None)
+    if record is not None:
+        raise ValueError("file ends in the middle of a game")
@@ -1,13 +1,24 @@
 # main.py
 
+import argparse
 from fianco_game import FiancoGame
-from ai import AIPlayer
+from ai import AIPlayer, MAX_PLY
+from mcts import MCTSPlayer
+from search_worker import SearchWorker
 from ui import GameUI
 
+# Every game played is appended to this game record file
+RECORD_PATH = 'games.fgr'
+
 def main():
     """
     Main function to run the Fianco game.
     """
+    parser = argparse.ArgumentParser(description="Play Fianco against the AI")
+    parser.add_argument('--engine', choices=('alphabeta', 'mcts'), default='alphabeta',
+                        help="AI search: alpha-beta (AIPlayer) or Monte Carlo tree search (MCTSPlayer)")
+    args = parser.parse_args()
+
     # Prompt for human player color
     human_color_input = input("Choose your color (W/B): ").upper()
     while human_color_input not in ['W', 'B']:
@@ -16,8 +27,13 @@ def main():
     ai_player = 3 - human_player
 
     game = FiancoGame()
-    ai_instance = AIPlayer(depth=3)  # Use 'depth' instead of 'max_depth'
-    game_ui = GameUI(game, human_player, ai_player, ai_instance)
+    # The AI searches in a background process so the window stays responsive; alpha-beta also ponders on the human's time.
+    # Alpha-beta has no depth cap: the move time bounds its searches and the next move stops pondering.
+    if args.engine == 'mcts':
+        search_worker = SearchWorker(MCTSPlayer, time_limit=5.0)
+    else:
+        search_worker = SearchWorker(AIPlayer, ponder=True, depth=MAX_PLY, time_limit=5.0)
+    game_ui = GameUI(game, human_player, ai_player, search_worker, RECORD_PATH)
     game_ui.run()
 
 if __name__ == "__main__":
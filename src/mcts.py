@@ -0,0 +1,439 @@
+# mcts.py
+
+import math
+import random
+import time
+from array import array
+from multiprocessing import Pool
+from constants import BOARD_SIZE
+from bitboard import NUM_SQUARES, GOAL_MASKS, MOVE_TUPLES, encode_move, generate_move_codes
+
+# Exploration constant of the UCT formula
+EXPLORATION = 1.4
+
+# Playouts still running after this many plies are decided by material
+PLAYOUT_LIMIT = 150
+
+# Cap on the tree size; once full, leaves are no longer expanded (20 bytes per node)
+MAX_NODES = 2_000_000
+
+# Leaves selected per process in each round of a parallel search
+LEAVES_PER_PROCESS = 8
+
+# Seconds between on_iteration reports
+REPORT_INTERVAL = 0.25
+
+# best_value is reported in the units of FiancoGame.evaluate() (a piece is worth 10), so
+# tools comparing values such as analyse.py treat both engines alike: the win rate is
+# converted to log-odds and multiplied by VALUE_SCALE, about 1 / K of the logistic fit
+# of tune.py on depth-4 games (K = 0.042: a piece up wins about 60% of the time).
+# Win rates count one extra win and loss, so rarely visited moves stay near even,
+# and are clamped to [MIN_WIN_RATE, 1 - MIN_WIN_RATE] (about +-170); proven results
+# are reported as +-WIN_SCORE.
+VALUE_SCALE = 24.0
+MIN_WIN_RATE = 0.001
+WIN_SCORE = 10000
+
+# first_child values of nodes that are not expanded
+UNEXPANDED = -1
+TERMINAL_WIN = -2  # The move into the node won the game
+TERMINAL_LOSS = -3  # The move into the node lost the game (third repetition)
+
+# Node columns: array type code of each field. Children of a node are stored contiguously,
+# from first_child to first_child + child_count - 1.
+NODE_FIELDS = {
+    'first_child': 'i',
+    'child_count': 'h',
+    'move': 'h',  # Encoded move into the node (see bitboard.encode_move)
+    'visits': 'i',
+    'wins': 'd',  # Results for the player who made the move into the node (draws count 1/2)
+}
+
+
+class NodeStore:
+    """
+    The search tree as one typed array per field instead of one Python object per node.
+    """
+
+    def __init__(self):
+        for name, code in NODE_FIELDS.items():
+            setattr(self, name, array(code))
+
+    def __len__(self):
+        return len(self.move)
+
+    @staticmethod
+    def bytes_per_node():
+        return sum(array(code).itemsize for code in NODE_FIELDS.values())
+
+    def memory_bytes(self):
+        return sum(len(column) * column.itemsize for column in (getattr(self, name) for name in NODE_FIELDS))
+
+    def add(self, move, visits=0, wins=0.0):
+        self.first_child.append(UNEXPANDED)
+        self.child_count.append(0)
+        self.move.append(move)
+        self.visits.append(visits)
+        self.wins.append(wins)
+        return len(self.move) - 1
+
+    def expand(self, node, codes):
+        """
+        Add a child for every encoded move.
+        """
+        self.first_child[node] = len(self.move)
+        self.child_count[node] = len(codes)
+        for code in codes:
+            self.add(code)
+
+    def subtree(self, root):
+        """
+        A new store holding the subtree under `root` (which becomes node 0).
+        """
+        store = NodeStore()
+        store.add(self.move[root], self.visits[root], self.wins[root])
+        queue = [(root, 0)]
+        for old, new in queue:
+            first = self.first_child[old]
+            if first < 0:
+                store.first_child[new] = first
+                continue
+            store.first_child[new] = len(store)
+            store.child_count[new] = self.child_count[old]
+            for child in range(first, first + self.child_count[old]):
+                queue.append((child, store.add(self.move[child], self.visits[child], self.wins[child])))
+        return store
+
+
+def _node_value(tree, node):
+    """
+    Value of a node for the player who made the move into it, in evaluation units.
+    """
+    if tree.first_child[node] == TERMINAL_WIN:
+        return WIN_SCORE
+    if tree.first_child[node] == TERMINAL_LOSS:
+        return -WIN_SCORE
+    rate = min(max((tree.wins[node] + 1) / (tree.visits[node] + 2), MIN_WIN_RATE), 1 - MIN_WIN_RATE)
+    return VALUE_SCALE * math.log(rate / (1 - rate))
+
+
+def apply_move(pieces, player, code):
+    """
+    Play an encoded move on a [0, white, black] bitboard list. Returns True if it wins
+    the game (promotion or capture of the last enemy piece).
+    """
+    start, end = divmod(code, NUM_SQUARES)
+    pieces[player] ^= (1 << start) | (1 << end)
+    if abs(start - end) > BOARD_SIZE + 1:
+        # A diagonal jump: remove the piece jumped over
+        opponent = 3 - player
+        pieces[opponent] &= ~(1 << ((start + end) >> 1))
+        if not pieces[opponent]:
+            return True
+    return bool((1 << end) & GOAL_MASKS[player])
+
+
+def playout(white, black, player, rng=random.random):
+    """
+    Play random legal moves from the position until the game ends.
+    Returns the winner (1 or 2), or 0 for a playout cut off at PLAYOUT_LIMIT with equal material.
+    """
+    pieces = [0, white, black]
+    moves = []
+    for _ in range(PLAYOUT_LIMIT):
+        generate_move_codes(pieces[player], pieces[3 - player], player, moves)
+        if not moves:
+            return 3 - player
+        if apply_move(pieces, player, moves[int(rng() * len(moves))]):
+            return player
+        player = 3 - player
+    difference = pieces[1].bit_count() - pieces[2].bit_count()
+    return 1 if difference > 0 else 2 if difference < 0 else 0
+
+
+def _playout_batch(task):
+    """
+    Pool worker: run the playouts of a list of (white, black, player) positions.
+    """
+    seed, positions = task
+    rng = random.Random(seed).random
+    return [playout(white, black, player, rng) for white, black, player in positions]
+
+
+class MCTSPlayer:
+    """
+    Monte Carlo tree search player with the get_move(game) interface of AIPlayer.
+
+    Each iteration descends the tree by UCT, expands the leaf it reaches and runs a light
+    random playout from it. Nodes live in a NodeStore. The tree is kept between moves:
+    if the new position follows from the last root by the moves played since, the
+    subtree below it is reused.
+
+    With processes > 1, each round selects several leaves before any playout returns.
+    Their visits are counted when they are selected, so a pending playout counts as a
+    loss (virtual loss) and steers the next selections to other leaves; the playouts
+    run in a process pool. A player that runs inside a SearchWorker must use
+    processes=1, since the worker process cannot start a pool.
+    """
+
+    def __init__(self, time_limit=5.0, playouts=None, processes=1, exploration=EXPLORATION,
+                 max_nodes=MAX_NODES, reuse_tree=True, seed=None):
+        """
+        time_limit: maximum seconds per move.
+        playouts: optional maximum number of playouts per move.
+        processes: number of playout processes (1 runs them in this process).
+        exploration: UCT exploration constant.
+        max_nodes: tree size cap.
+        reuse_tree: keep the subtree of the new position between moves.
+        """
+        self.time_limit = time_limit
+        self.max_playouts = playouts
+        self.processes = processes
+        self.exploration = exploration
+        self.max_nodes = max_nodes
+        self.reuse_tree = reuse_tree
+        self.rng = random.Random(seed)
+        self.stop_event = None  # Optional threading/multiprocessing Event that ends the search
+        self.on_iteration = None  # Optional callback(depth, best_move, best_value, playouts), called periodically
+        self.tree = NodeStore()
+        self._root_history = None  # Moves of the game at the root of the kept tree
+        self._pool = None
+        self.playouts = 0
+        self.seconds = 0.0
+        self.best_value = None  # Value of the chosen move in evaluation units (see VALUE_SCALE)
+        self.principal_variation = []
+        self.completed_depth = 0
+
+    @property
+    def playouts_per_second(self):
+        return self.playouts / self.seconds if self.seconds else 0.0
+
+    @property
+    def bytes_per_node(self):
+        return NodeStore.bytes_per_node()
+
+    def new_game(self):
+        self.tree = NodeStore()
+        self._root_history = None
+
+    def close(self):
+        """
+        Stop the playout processes, if any.
+        """
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _set_root(self, game):
+        """
+        Make the tree's root the game's position, reusing the old tree if possible.
+        """
+        history = [move for _, move, _ in game.move_history]
+        old = self._root_history
+        node = 0 if self.reuse_tree and old is not None and len(self.tree) and history[:len(old)] == old else None
+        if node is not None:
+            tree = self.tree
+            for move in history[len(old):]:
+                first = tree.first_child[node]
+                code = encode_move(move)
+                node = next((child for child in range(first, first + tree.child_count[node])
+                             if tree.move[child] == code), None) if first >= 0 else None
+                if node is None:
+                    break
+        if node is None:
+            self.tree = NodeStore()
+            self.tree.add(-1)
+        elif node:
+            self.tree = self.tree.subtree(node)
+        self._root_history = history
+        self._expand_root(game)
+
+    def _expand_root(self, game):
+        """
+        Expand the root if needed and mark the root moves that end the game, checked on the
+        game itself so that moves losing by repetition are known.
+        """
+        tree = self.tree
+        player = game.current_player
+        if tree.first_child[0] < 0:
+            tree.first_child[0] = UNEXPANDED
+            tree.expand(0, generate_move_codes(game.pieces[player], game.pieces[3 - player], player))
+        first = tree.first_child[0]
+        for child in range(first, first + tree.child_count[0]):
+            game.make_move(MOVE_TUPLES[tree.move[child]])
+            winner = game.get_winner()
+            game.undo_move()
+            if winner is not None:
+                tree.first_child[child] = TERMINAL_WIN if winner == player else TERMINAL_LOSS
+
+    def _select(self, root_pieces, root_player):
+        """
+        Descend from the root to a leaf, counting a visit on every node of the path.
+        Returns (path, pieces, player to move at the leaf, winner if decided else None).
+        """
+        tree = self.tree
+        first_child, child_count, visits, wins = tree.first_child, tree.child_count, tree.visits, tree.wins
+        log = math.log
+        exploration = self.exploration
+        pieces = list(root_pieces)
+        player = root_player
+        node = 0
+        path = [0]
+        visits[0] += 1
+        while True:
+            first = first_child[node]
+            if first == TERMINAL_WIN:
+                return path, pieces, player, 3 - player  # The player who moved into the node won
+            if first == TERMINAL_LOSS:
+                return path, pieces, player, player
+            if first == UNEXPANDED:
+                if len(tree) + NUM_SQUARES > self.max_nodes:
+                    return path, pieces, player, None
+                codes = generate_move_codes(pieces[player], pieces[3 - player], player)
+                if not codes:
+                    first_child[node] = TERMINAL_WIN
+                    return path, pieces, player, 3 - player
+                tree.expand(node, codes)
+                return path, pieces, player, None
+            # UCT: best average result plus an exploration bonus; unvisited children first
+            scale = exploration * math.sqrt(log(visits[node]))
+            best, best_score = first, -1.0
+            for child in range(first, first + child_count[node]):
+                n = visits[child]
+                if n == 0:
+                    best = child
+                    break
+                score = wins[child] / n + scale / math.sqrt(n)
+                if score > best_score:
+                    best, best_score = child, score
+            node = best
+            path.append(node)
+            visits[node] += 1
+            if apply_move(pieces, player, tree.move[node]):
+                first_child[node] = TERMINAL_WIN
+                return path, pieces, 3 - player, player
+            player = 3 - player
+
+    def _backup(self, path, leaf_player, winner):
+        """
+        Add a result along a path (its visits were counted by _select).
+        """
+        wins = self.tree.wins
+        # The move into the leaf was made by the opponent of the player to move there
+        mover = 3 - leaf_player
+        for node in reversed(path):
+            if winner == 0:
+                wins[node] += 0.5
+            elif winner == mover:
+                wins[node] += 1.0
+            mover = 3 - mover
+
+    def _finished(self, start, playouts):
+        if self.stop_event is not None and self.stop_event.is_set():
+            return True
+        if self.max_playouts is not None and playouts >= self.max_playouts:
+            return True
+        return time.time() - start >= self.time_limit
+
+    def get_move(self, game):
+        """
+        Search until the time or playout limit and return the most visited root move.
+        """
+        start = time.time()
+        self.playouts = 0
+        self.best_value = None
+        self.principal_variation = []
+        self._set_root(game)
+        tree = self.tree
+        root_moves = range(tree.first_child[0], tree.first_child[0] + tree.child_count[0])
+        if len(root_moves) <= 1:
+            self.seconds = time.time() - start
+            return MOVE_TUPLES[tree.move[root_moves[0]]] if root_moves else None
+
+        root_pieces, root_player = list(game.pieces), game.current_player
+        if self.processes > 1 and self._pool is None:
+            self._pool = Pool(self.processes)
+        next_report = start + REPORT_INTERVAL
+        while not self._finished(start, self.playouts):
+            if self._pool is None:
+                path, pieces, player, winner = self._select(root_pieces, root_player)
+                if winner is None:
+                    winner = playout(pieces[1], pieces[2], player, self.rng.random)
+                self._backup(path, player, winner)
+                self.playouts += 1
+            else:
+                self._parallel_round(root_pieces, root_player)
+            if self.on_iteration is not None and time.time() >= next_report:
+                next_report = time.time() + REPORT_INTERVAL
+                self._report()
+        self.seconds = time.time() - start
+        best = self._best_child(0)
+        self._report()
+        return MOVE_TUPLES[tree.move[best]]
+
+    def move_values(self):
+        """
+        {move: value} of every root move the last search visited, in evaluation units.
+        Values of moves from one tree compare fairly; values of different positions are
+        biased towards the side to move, whom random playouts favour.
+        """
+        tree = self.tree
+        first = tree.first_child[0]
+        if first < 0:
+            return {}
+        return {MOVE_TUPLES[tree.move[child]]: _node_value(tree, child)
+                for child in range(first, first + tree.child_count[0])
+                if tree.visits[child] or tree.first_child[child] in (TERMINAL_WIN, TERMINAL_LOSS)}
+
+    def _parallel_round(self, root_pieces, root_player):
+        """
+        Select a batch of leaves (virtual loss keeps them apart), run their playouts in the
+        pool, one chunk per process, and back the results up.
+        """
+        selections = []
+        playout_jobs = []
+        for _ in range(self.processes * LEAVES_PER_PROCESS):
+            path, pieces, player, winner = self._select(root_pieces, root_player)
+            selections.append((path, player, winner))
+            if winner is None:
+                playout_jobs.append((pieces[1], pieces[2], player))
+        chunk = -(-len(playout_jobs) // self.processes) or 1
+        tasks = [(self.rng.getrandbits(32), playout_jobs[i:i + chunk]) for i in range(0, len(playout_jobs), chunk)]
+        results = iter([winner for batch in self._pool.map(_playout_batch, tasks) for winner in batch])
+        for path, player, winner in selections:
+            self._backup(path, player, next(results) if winner is None else winner)
+        self.playouts += len(selections)
+
+    def _best_child(self, node):
+        tree = self.tree
+        first = tree.first_child[node]
+        return max(range(first, first + tree.child_count[node]), key=tree.visits.__getitem__)
+
+    def _report(self):
+        """
+        Update the principal variation (most visited path) and value, and report them.
+        """
+        tree = self.tree
+        pv = []
+        node = 0
+        best = None
+        while tree.first_child[node] >= 0:
+            child = self._best_child(node)
+            if not tree.visits[child]:
+                break
+            best = child if best is None else best
+            pv.append(MOVE_TUPLES[tree.move[child]])
+            node = child
+        if best is None:
+            return
+        self.principal_variation = pv
+        self.completed_depth = len(pv)
+        self.best_value = _node_value(tree, best)
+        if self.on_iteration is not None:
+            self.on_iteration(len(pv), pv[0], self.best_value, self.playouts)
@@ -0,0 +1,99 @@
+# opening_book.py
+
+import mmap
+import random
+import struct
+from bitboard import decode_move
+from symmetry import NUM_SYMMETRIES, symmetric_keys, transform_move
+
+# Book file: a 16-byte header followed by fixed 16-byte records sorted by (key, move):
+# Zobrist key of the position, encoded move, visit count and average score
+# (from the point of view of the player to move).
+# With CANONICAL_KEYS in the header flags, positions are stored under their canonical image
+# (see symmetry.py) and moves are moves of that image; older books have no flags.
+MAGIC = b'FBK1'
+HEADER = struct.Struct('<4sII4x')
+CANONICAL_KEYS = 1
+RECORD = struct.Struct('<QHHf')
+MAX_VISITS = 0xFFFF
+
+
+class OpeningBook:
+    """
+    Read-only opening book, memory-mapped and searched by binary search on the position key.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.num_records, flags = HEADER.unpack_from(self._map)
+        self.canonical = bool(flags & CANONICAL_KEYS)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an opening book")
+
+    def _key_at(self, index):
+        return struct.unpack_from('<Q', self._map, HEADER.size + index * RECORD.size)[0]
+
+    def lookup(self, key):
+        """
+        Return the book entries of a position as a list of (move, visits, score).
+        """
+        low, high = 0, self.num_records
+        while low < high:
+            mid = (low + high) // 2
+            if self._key_at(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        entries = []
+        while low < self.num_records:
+            record_key, code, visits, score = RECORD.unpack_from(self._map, HEADER.size + low * RECORD.size)
+            if record_key != key:
+                break
+            entries.append((decode_move(code), visits, score))
+            low += 1
+        return entries
+
+    def entries(self, game):
+        """
+        The book entries of a game position as a list of (move, visits, score).
+        In a book with canonical keys, a position that is its own image under some
+        symmetries gets the images of the stored moves under all of them, each with
+        an equal share of the visits.
+        """
+        if not self.canonical:
+            return self.lookup(game.hash)
+        keys = symmetric_keys(game.symmetric_hash)
+        key = min(keys)
+        matching = [symmetry for symmetry in range(NUM_SYMMETRIES) if keys[symmetry] == key]
+        merged = {}
+        for move, visits, score in self.lookup(key):
+            for symmetry in matching:
+                image = transform_move(symmetry, move)
+                merged[image] = (merged.get(image, (0, score))[0] + visits / len(matching), score)
+        return [(move, visits, score) for move, (visits, score) in merged.items()]
+
+    def choose(self, game, rng=random):
+        """
+        Pick a book move for the game position, weighted by visit count, or None if out of book.
+        """
+        legal_moves = game.get_possible_moves(game.current_player)
+        entries = [entry for entry in self.entries(game) if entry[0] in legal_moves]
+        if not entries:
+            return None
+        return rng.choices([move for move, _, _ in entries], weights=[visits for _, visits, _ in entries])[0]
+
+    def close(self):
+        self._map.close()
+
+
+def write_book(path, stats, canonical=True):
+    """
+    Write {(key, move_code): [visits, total_score]} as a sorted book file; canonical says
+    whether the keys and moves are those of canonical images.
+    """
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(stats), CANONICAL_KEYS if canonical else 0))
+        for (key, code), (visits, total_score) in sorted(stats.items()):
+            f.write(RECORD.pack(key, code, min(visits, MAX_VISITS), total_score / visits))
@@ -0,0 +1,131 @@
+# parallel_search.py
+
+import multiprocessing as mp
+import queue
+import time
+from multiprocessing import shared_memory
+from ai import AIPlayer
+from search_worker import SearchStop
+from transposition import TranspositionTable
+
+# Seconds to wait for helpers to report after a search is stopped
+HELPER_REPORT_TIMEOUT = 5.0
+
+
+def _helper_main(shm_name, table_bytes, index, jobs, results, active, options):
+    """
+    Helper process loop: search every position it is sent until its search is no longer
+    the active one, and report the search id with the result. A job whose search is already
+    over is still answered (with no nodes and depth 0), so the main search never waits for it.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    helper = AIPlayer(**options)
+    helper.transposition_table = TranspositionTable(buffer=shm.buf[:table_bytes])
+    # Lazy SMP: odd helpers start one ply deeper, and each helper starts the root with a different move
+    helper.start_depth = 1 + index % 2
+    helper.root_offset = index
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            search_id, game, age = job
+            if active.value != search_id:
+                results.put((search_id, index, 0, 0))  # The main search is already over
+                continue
+            helper.stop_event = SearchStop(active, search_id)
+            helper.transposition_table.age = age  # get_move advances it in step with the main search
+            helper.get_move(game)
+            results.put((search_id, index, helper.nodes, helper.completed_depth))
+    finally:
+        helper.transposition_table.release()
+        shm.close()
+
+
+class ParallelAIPlayer(AIPlayer):
+    """
+    Lazy SMP search: the main process runs the normal iterative deepening search while
+    workers - 1 helper processes search the same position with staggered depths.
+    All of them read and write one transposition table in shared memory, so the main
+    search picks up the helpers' results without any pickling. The move returned is
+    the main search's. Each search has an id: helpers stop as soon as their search is no
+    longer the active one, and late results of earlier searches are ignored.
+
+    Call close() (or use the player as a context manager) to stop the helper processes.
+    """
+
+    def __init__(self, workers=2, depth=3, time_limit=5.0, tt_size_mb=16, **options):
+        super().__init__(depth=depth, time_limit=time_limit, tt_size_mb=0, **options)
+        self.workers = workers
+        table_bytes = TranspositionTable.size_in_bytes(tt_size_mb)
+        self._shm = shared_memory.SharedMemory(create=True, size=table_bytes)
+        self.transposition_table = TranspositionTable(buffer=self._shm.buf[:table_bytes])
+        self.transposition_table.clear()
+        self.total_nodes = 0
+        self.helper_depths = []
+
+        # Helpers search until stopped; the main search owns the clock
+        helper_options = dict(options, depth=depth, time_limit=float('inf'), keep_tt=True)
+        self._active = mp.RawValue('q', -1)  # Id of the search the helpers should work on
+        self._search_id = -1
+        self._results = mp.Queue()
+        self._jobs = []
+        self._helpers = []
+        for index in range(1, workers):
+            jobs = mp.Queue()
+            helper = mp.Process(target=_helper_main, daemon=True,
+                                args=(self._shm.name, table_bytes, index, jobs, self._results,
+                                      self._active, helper_options))
+            helper.start()
+            self._jobs.append(jobs)
+            self._helpers.append(helper)
+
+    def get_move(self, game):
+        """
+        Search with all workers and return the main search's best move.
+        """
+        self._search_id += 1
+        self._active.value = self._search_id
+        snapshot = game.clone()
+        snapshot.move_history = snapshot.move_history[-6:]  # Enough for repetition detection
+        snapshot._undo_stack = snapshot._undo_stack[-6:]
+        for jobs in self._jobs:
+            jobs.put((self._search_id, snapshot, self.transposition_table.age))
+        try:
+            return super().get_move(game)
+        finally:
+            self._active.value = -1  # Stops the helpers
+            self.total_nodes = self.nodes
+            self.helper_depths = []
+            deadline = time.time() + HELPER_REPORT_TIMEOUT
+            while len(self.helper_depths) < len(self._helpers):
+                try:
+                    search_id, _, nodes, depth = self._results.get(timeout=max(0.0, deadline - time.time()))
+                except queue.Empty:
+                    break  # A helper is late: its result will be ignored by the next search
+                if search_id != self._search_id:
+                    continue  # Late result of an earlier search
+                self.total_nodes += nodes
+                self.helper_depths.append(depth)
+
+    def close(self):
+        """
+        Stop the helper processes and free the shared transposition table.
+        """
+        if self._shm is None:
+            return
+        self._active.value = -1
+        for jobs in self._jobs:
+            jobs.put(None)
+        for helper in self._helpers:
+            helper.join()
+        self.transposition_table.release()
+        self._shm.close()
+        self._shm.unlink()
+        self._shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
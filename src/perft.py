@@ -0,0 +1,118 @@
+# perft.py
+
+import argparse
+import time
+from fianco_game import convert_move_to_notation
+from positions import BENCHMARK_POSITIONS, benchmark_position
+
+# Leaf counts of the benchmark positions at depth 1, 2, ... (index 0 is depth 1).
+# Counted with the original numpy FiancoGame; decided positions are not expanded.
+REFERENCE_COUNTS = {
+    'opening': [25, 623, 14975, 356399, 8419237],
+    'early': [27, 729, 19553, 495541, 13119126],
+    'middlegame': [39, 1334, 42556, 1377273, 41721282],
+    'middlegame2': [33, 899, 24959, 610472, 16445589],
+    'late': [29, 606, 12036, 234637, 4665944],
+}
+
+
+def perft(game, depth):
+    """
+    Count the positions reached after exactly `depth` plies of legal moves.
+    Positions where the game is decided are not expanded.
+    """
+    if depth == 0:
+        return 1
+    if game.is_terminal():
+        return 0
+    moves = game.get_possible_moves(game.current_player)
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        game.make_move(move)
+        nodes += perft(game, depth - 1)
+        game.undo_move()
+    return nodes
+
+
+def divide(game, depth):
+    """
+    perft split by root move: a list of (move, leaf count).
+    """
+    counts = []
+    for move in game.get_possible_moves(game.current_player):
+        game.make_move(move)
+        counts.append((move, perft(game, depth - 1)))
+        game.undo_move()
+    return counts
+
+
+def game_state(game):
+    """
+    Everything make_move/undo_move must restore, for checking that a perft run left the game unchanged.
+    """
+    return (list(game.pieces), game.hash, game.symmetric_hash, list(game.advancement), list(game.centrality),
+            game.current_player, game.move_count, len(game.move_history), dict(game.captured_pieces))
+
+
+def run_suite(max_depth=None, min_nps=0.0, log=print):
+    """
+    Run perft on every position with reference counts, up to max_depth (all recorded depths by default).
+    Returns the number of failures: wrong counts, a game not restored by undo_move,
+    or a depth slower than min_nps nodes/s.
+    """
+    failures = 0
+    log(f"{'position':<12}{'depth':>6}{'nodes':>12}{'time(s)':>10}{'nodes/s':>12}  result")
+    for name, counts in REFERENCE_COUNTS.items():
+        game = benchmark_position(name)
+        before = game_state(game)
+        for depth, expected in enumerate(counts[:max_depth], 1):
+            start = time.perf_counter()
+            nodes = perft(game, depth)
+            seconds = time.perf_counter() - start
+            rate = nodes / seconds if seconds else float('inf')
+            if nodes != expected:
+                result = f"FAIL (expected {expected})"
+            elif game_state(game) != before:
+                result = "FAIL (game not restored)"
+            elif rate < min_nps and seconds > 0.1:  # Too short to time reliably
+                result = f"SLOW (below {min_nps:.0f} nodes/s)"
+            else:
+                result = "ok"
+            failures += result != "ok"
+            log(f"{name:<12}{depth:>6}{nodes:>12}{seconds:>10.3f}{rate:>12.0f}  {result}")
+    return failures
+
+
+def main():
+    """
+    Check move generation against the reference counts, or print a divide for one position.
+    Exits with status 1 if any check fails, so it can be used as a regression gate.
+    """
+    parser = argparse.ArgumentParser(description="Fianco move generation perft")
+    parser.add_argument('--depth', type=int, default=4, help="maximum depth (references go to depth 5)")
+    parser.add_argument('--min-nps', type=float, default=0.0, help="fail any depth slower than this")
+    parser.add_argument('--divide', choices=list(BENCHMARK_POSITIONS), help="print per-move counts for a position")
+    args = parser.parse_args()
+
+    if args.divide:
+        game = benchmark_position(args.divide)
+        start = time.perf_counter()
+        counts = divide(game, args.depth)
+        seconds = time.perf_counter() - start
+        for move, nodes in counts:
+            print(f"{convert_move_to_notation(move)}: {nodes}")
+        total = sum(nodes for _, nodes in counts)
+        print(f"total: {total} nodes in {seconds:.3f}s ({total / seconds:.0f} nodes/s)")
+        return
+
+    failures = run_suite(args.depth, args.min_nps)
+    if failures:
+        print(f"{failures} check(s) failed")
+        raise SystemExit(1)
+    print("all checks passed")
+
+
+if __name__ == "__main__":
+    main()
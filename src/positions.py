@@ -0,0 +1,44 @@
+# positions.py
+
+from fianco_game import FiancoGame, parse_notation
+
+# A recorded engine game used as a fixed source of benchmark positions.
+# Positions are replayed from the start so move_history and move_count are realistic.
+BENCHMARK_GAME = [
+    'B2 A2', 'F6 E6', 'F4 G4', 'G7 F7', 'F1 F2', 'C7 C6', 'D4 E4', 'D9 D8', 'I1 I2', 'F9 F8',
+    'D1 D2', 'C6 C5', 'G4 G5', 'H8 H7', 'I2 I3', 'H9 H8', 'B1 B2', 'B8 B7', 'E4 F4', 'B9 B8',
+    'F4 E4', 'C9 D9', 'A2 A3', 'D9 C9', 'I3 I4', 'C5 C4', 'B2 C2', 'B7 B6', 'E4 F4', 'B8 B7',
+    'G3 F3', 'B6 C6', 'F4 E4', 'C6 C5', 'A3 A4', 'D6 C6', 'D2 E2', 'E9 F9', 'H2 H3', 'A9 A8',
+    'H1 H2', 'F8 E8', 'E4 E5', 'B7 C7', 'E2 E3', 'F9 E9', 'E3 E4', 'A8 B8', 'F3 E3', 'C6 B6',
+    'I4 I5', 'E8 E7', 'A4 A5', 'H8 G8', 'A5 B5', 'C9 C8', 'H3 H4', 'C7 C6', 'B5 D7', 'C8 C7',
+    'A1 A2', 'C4 B4', 'C3 A5', 'C7 C6', 'A5 C7', 'D8 B6', 'H2 G2', 'E9 D9', 'E1 D1', 'D9 D8',
+]
+
+# Number of plies of BENCHMARK_GAME played to reach each benchmark position
+BENCHMARK_POSITIONS = {
+    'opening': 0,
+    'early': 10,
+    'middlegame': 24,
+    'middlegame2': 44,
+    'late': 70,
+}
+
+
+def load_position(moves):
+    """
+    Return a new game with the given moves (in notation) played from the start position.
+    """
+    game = FiancoGame()
+    for notation in moves:
+        move = parse_notation(notation)
+        if not game.validate_move(move):
+            raise ValueError(f"Illegal move in position: {notation}")
+        game.make_move(move)
+    return game
+
+
+def benchmark_position(name):
+    """
+    Return the named benchmark position (a key of BENCHMARK_POSITIONS).
+    """
+    return load_position(BENCHMARK_GAME[:BENCHMARK_POSITIONS[name]])
@@ -0,0 +1,152 @@
+# search_cache.py
+
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import time
+from transposition import TranspositionTable, BUCKET_BYTES, EXACT, LOWER, UPPER
+
+# Cache file: a 64-byte header followed by transposition table buckets (see transposition.py).
+# Header: magic, number of buckets, generation (bumped by every process that opens the file
+# and every new game, so entries of older sessions are the first to be replaced).
+MAGIC = b'FSC1'
+HEADER = struct.Struct('<4s4xQQ')
+HEADER_BYTES = 64
+GENERATION_OFFSET = 16
+
+# Only results of searches at least this deep are worth sharing
+CACHE_MIN_DEPTH = 3
+
+# Seconds to wait for another process to finish creating the file
+CREATE_TIMEOUT = 5.0
+
+
+def cache_salt(*config):
+    """
+    A 64-bit value mixed into the keys of a cache, derived from everything the scores
+    depend on besides the position (evaluation weights, quiescence, tablebase), so that engines
+    configured differently can share a file without reading each other's scores.
+    """
+    return int.from_bytes(hashlib.blake2b(repr(config).encode(), digest_size=8).digest(), 'little')
+
+
+class SearchCache:
+    """
+    Persistent cache of search results shared by any number of processes: a transposition
+    table in a memory-mapped file of fixed size.
+
+    Entries are written without locks, exactly like the table shared by the Lazy SMP
+    helpers: each slot's key check covers the whole entry, so a slot torn by two
+    concurrent writers is simply not found. The file never grows: a bucket keeps the
+    deepest entry unless it is from an older generation, plus the most recent one.
+    """
+
+    def __init__(self, path, size_mb=64, salt=0, min_depth=CACHE_MIN_DEPTH, start_generation=True):
+        """
+        Open the cache file at path, creating it with about size_mb megabytes if it does
+        not exist (the size of an existing file is kept). start_generation=False opens it
+        for inspection: the stored entries do not age.
+        """
+        self.path = path
+        self.salt = salt
+        self.min_depth = min_depth
+        self._create(path, size_mb)
+        self._file = open(path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        deadline = time.time() + CREATE_TIMEOUT
+        while self._map[:4] != MAGIC:
+            # Another process created the file and has not written the header yet
+            if time.time() > deadline or any(self._map[:4]) and self._map[:4] != MAGIC:
+                self.close()
+                raise ValueError(f"{path}: not a search cache file")
+            time.sleep(0.01)
+        _, buckets, _ = HEADER.unpack_from(self._map)
+        if len(self._map) != HEADER_BYTES + buckets * BUCKET_BYTES:
+            self.close()
+            raise ValueError(f"{path}: size does not match its header")
+        self.table = TranspositionTable(buffer=memoryview(self._map)[HEADER_BYTES:])
+        if start_generation:
+            self.new_generation()
+        else:
+            self.table.age = struct.unpack_from('<Q', self._map, GENERATION_OFFSET)[0] & 0xFF
+
+    @staticmethod
+    def _create(path, size_mb):
+        try:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+        except FileExistsError:
+            return
+        table_bytes = TranspositionTable.size_in_bytes(size_mb)
+        with os.fdopen(fd, 'r+b') as f:
+            f.truncate(HEADER_BYTES + table_bytes)
+            with mmap.mmap(f.fileno(), 0) as header_map:
+                # The magic is written last: readers wait for it
+                HEADER.pack_into(header_map, 0, b'\0' * 4, table_bytes // BUCKET_BYTES, 0)
+                header_map[:4] = MAGIC
+
+    def new_generation(self):
+        """
+        Start a new generation; entries from older ones become preferred victims.
+        """
+        generation = struct.unpack_from('<Q', self._map, GENERATION_OFFSET)[0] + 1
+        struct.pack_into('<Q', self._map, GENERATION_OFFSET, generation)
+        self.table.age = generation & 0xFF
+
+    def probe(self, key):
+        """
+        Look up a position. Returns (depth, flag, score, move_code) or None, as TranspositionTable.probe.
+        """
+        return self.table.probe(key ^ self.salt)
+
+    def store(self, key, depth, flag, score, move_code=-1):
+        """
+        Store a search result if it is deep enough to be worth sharing.
+        """
+        if depth >= self.min_depth:
+            self.table.store(key ^ self.salt, depth, flag, score, move_code)
+
+    def flush(self):
+        self._map.flush()
+
+    def close(self):
+        if self._map is None:
+            return
+        if hasattr(self, 'table'):
+            self.table.release()
+        self._map.close()
+        self._file.close()
+        self._map = None
+
+    def summary(self):
+        """
+        (used slots, total slots, {depth: entries}, {flag: entries}) of the cache.
+        """
+        depths = {}
+        flags = {EXACT: 0, LOWER: 0, UPPER: 0}
+        used = 0
+        for depth, flag, _, _ in self.table.entries():
+            used += 1
+            depths[depth] = depths.get(depth, 0) + 1
+            flags[flag] += 1
+        return used, len(self.table), depths, flags
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect or create a persistent search cache")
+    parser.add_argument('path')
+    parser.add_argument('--size-mb', type=float, default=64, help="size of a new cache file")
+    args = parser.parse_args()
+
+    cache = SearchCache(args.path, args.size_mb, start_generation=False)
+    used, total, depths, flags = cache.summary()
+    print(f"{args.path}: {used}/{total} slots used ({100 * used / total:.1f}%), "
+          f"{os.path.getsize(args.path) / 1024 / 1024:.1f} MB")
+    print("entries by depth: " + ', '.join(f"{depth}: {count}" for depth, count in sorted(depths.items())))
+    print(f"exact {flags[EXACT]}, lower bound {flags[LOWER]}, upper bound {flags[UPPER]}")
+    cache.close()
+
+
+if __name__ == "__main__":
+    main()
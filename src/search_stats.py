@@ -0,0 +1,136 @@
+# search_stats.py
+
+import cProfile
+import json
+import os
+import pstats
+import time
+from fianco_game import convert_move_to_notation
+
+# Functions whose cumulative time is reported in the profile breakdown
+PROFILED_FUNCTIONS = ('get_possible_moves', 'get_captures', 'evaluate', 'make_move', 'undo_move',
+                      'clone', 'is_terminal', 'probe', 'store')
+
+
+class SearchStats:
+    """
+    Optional statistics collector for AIPlayer (pass it as AIPlayer(stats=...)).
+
+    Counters are reset at the start of every get_move call and describe that search:
+    node counts, transposition table hits, beta cutoffs and how many of them came from
+    the first move searched, plus one record per completed iterative deepening depth.
+    With log_path, every search is appended to that file as one JSON line.
+    With profile_dir, every search runs under cProfile; the dump is written there and
+    the time spent in the main game and table functions is added to the record.
+    """
+
+    def __init__(self, log_path=None, profile_dir=None):
+        self.log_path = log_path
+        self.profile_dir = profile_dir
+        self.searches = 0
+        self._profiler = None
+        self.reset()
+
+    def reset(self):
+        self.nodes = 0
+        self.qnodes = 0
+        self.evaluations = 0
+        self.tt_probes = 0
+        self.tt_hits = 0  # Probes that found an entry for the position
+        self.tt_cutoffs = 0  # Nodes answered by the table without searching
+        self.cache_hits = 0  # Positions found in the persistent search cache (see search_cache.py)
+        self.cutoffs = 0  # Beta cutoffs in the main search
+        self.first_move_cutoffs = 0  # ... caused by the first move searched
+        self.researches = 0  # PVS, LMR and aspiration window re-searches
+        self.depths = []
+        self.position = None
+        self.move = None
+        self.seconds = 0.0
+        self.time_breakdown = {}
+        self._start_time = time.perf_counter()
+        self._iteration_start = self._start_time
+        self._iteration_nodes = 0
+
+    def start(self, game):
+        """
+        Called by AIPlayer.get_move before searching.
+        """
+        self.reset()
+        self.position = {'move_count': game.move_count, 'player': game.current_player, 'hash': game.hash}
+        if self.profile_dir:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def iteration_finished(self, depth, nodes, best_move, best_value):
+        """
+        Record a completed iterative deepening iteration; nodes is the running total.
+        """
+        now = time.perf_counter()
+        iteration_nodes = nodes - self._iteration_nodes
+        previous = self.depths[-1]['nodes'] if self.depths else 0
+        self.depths.append({
+            'depth': depth,
+            'nodes': iteration_nodes,
+            'seconds': now - self._iteration_start,
+            'move': convert_move_to_notation(best_move),
+            'value': best_value,
+            # Effective branching factor: growth of the tree from one depth to the next
+            'ebf': iteration_nodes / previous if previous else None,
+        })
+        self._iteration_start = now
+        self._iteration_nodes = nodes
+
+    def finish(self, ai, move):
+        """
+        Called by AIPlayer.get_move with the move it returns.
+        """
+        self.seconds = time.perf_counter() - self._start_time
+        self.nodes = ai.nodes
+        self.qnodes = ai.qnodes
+        self.move = move
+        self.searches += 1
+        if self._profiler is not None:
+            self._profiler.disable()
+            os.makedirs(self.profile_dir, exist_ok=True)
+            path = os.path.join(self.profile_dir, f"search_{self.searches:04d}.prof")
+            self._profiler.dump_stats(path)
+            self.time_breakdown = profile_breakdown(path)
+            self._profiler = None
+        if self.log_path:
+            with open(self.log_path, 'a') as f:
+                f.write(json.dumps(self.as_dict()) + '\n')
+
+    def as_dict(self):
+        """
+        The statistics of the last search as a JSON-serialisable dict.
+        """
+        return {
+            'search': self.searches,
+            'position': self.position,
+            'move': convert_move_to_notation(self.move) if self.move else None,
+            'seconds': self.seconds,
+            'nodes': self.nodes,
+            'qnodes': self.qnodes,
+            'nodes_per_second': self.nodes / self.seconds if self.seconds else 0.0,
+            'evaluations': self.evaluations,
+            'tt_probes': self.tt_probes,
+            'tt_hit_rate': self.tt_hits / self.tt_probes if self.tt_probes else 0.0,
+            'tt_cutoffs': self.tt_cutoffs,
+            'cache_hits': self.cache_hits,
+            'cutoffs': self.cutoffs,
+            'first_move_cutoff_rate': self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0,
+            'researches': self.researches,
+            'depths': self.depths,
+            'time_breakdown': self.time_breakdown,
+        }
+
+
+def profile_breakdown(path):
+    """
+    Cumulative seconds spent in each of PROFILED_FUNCTIONS, read from a cProfile dump.
+    """
+    breakdown = {}
+    for (_, _, name), (_, _, _, cumulative, _) in pstats.Stats(path).stats.items():
+        if name in PROFILED_FUNCTIONS:
+            breakdown[name] = breakdown.get(name, 0.0) + cumulative
+    return breakdown
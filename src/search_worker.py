@@ -0,0 +1,240 @@
+# search_worker.py
+
+import multiprocessing as mp
+import queue
+import time
+from ai import AIPlayer
+
+# Seconds to wait for the worker process to exit before terminating it
+WORKER_EXIT_TIMEOUT = 2.0
+
+
+class SearchStop:
+    """
+    Stop flag of one search: set as soon as the search is no longer the active one.
+    Used as the player's stop_event, so a cancelled search stops within a few
+    thousand nodes without touching the flag of the next search. `active` is a shared
+    value (e.g. multiprocessing.RawValue) holding the id of the active search.
+    """
+
+    def __init__(self, active, search_id):
+        self.active = active
+        self.search_id = search_id
+
+    def is_set(self):
+        return self.active.value != self.search_id
+
+
+class _PonderControl:
+    """
+    Stop flag of a ponder search, which also watches for the next job while pondering.
+    If the job is the predicted position (a ponder hit), the ponder search becomes the
+    real search: its clock starts now and it keeps going. Otherwise (a miss) the ponder
+    search stops and the job is kept for the worker loop; the transposition table keeps
+    whatever the ponder search stored.
+    """
+
+    def __init__(self, player, position, time_limit, jobs, updates, active, current):
+        self.player = player
+        self.position = position
+        self.time_limit = time_limit
+        self.total_time = player.time_manager.total_time
+        self.jobs = jobs
+        self.updates = updates
+        self.active = active
+        self.current = current
+        self.hit = None  # Id of the search that hit the ponder position
+        self.missed = []  # The job that arrived instead, if any
+
+    def is_set(self):
+        if self.hit is not None:
+            return self.active.value != self.hit
+        try:
+            job = self.jobs.get_nowait()
+        except queue.Empty:
+            return False
+        if (job is not None and job[0] == self.active.value and job[1].hash == self.position.hash
+                and _moves_played(job[1]) == _moves_played(self.position)):
+            self.hit = job[0]
+            self.current['id'] = job[0]
+            player = self.player
+            player.time_limit = self.time_limit
+            player.time_manager.time_limit = self.time_limit
+            player.time_manager.total_time = self.total_time
+            player.time_manager.start(job[1])
+            player.start_time = player.time_manager.start_time
+            player.deadline = player.time_manager.deadline
+            if player.completed_depth:
+                # Report the depth pondering already reached
+                self.updates.put(('info', job[0], player.completed_depth, player.principal_variation[0],
+                                  player.best_value, player.nodes))
+            return False
+        self.missed.append(job)
+        return True
+
+
+def _moves_played(game):
+    """
+    The moves of a game without their durations, for comparing histories.
+    """
+    return [(player, move) for player, move, _ in game.move_history]
+
+
+def _ponder(player, game, move, time_limit, jobs, updates, active, current, pending):
+    """
+    After the player chose `move` in `game`, search the position after the reply its
+    principal variation predicts until the next job arrives.
+    Returns (position, move) if the prediction was right and the continued search
+    finished, None otherwise (a missed job is appended to pending).
+    """
+    pv = player.principal_variation
+    if len(pv) < 2 or pv[0] != move:
+        return None  # No prediction (book move, forced move or no completed depth)
+    position = game.clone()
+    position.make_move(move)
+    if position.is_terminal():
+        return None
+    position.make_move(pv[1])
+    if position.is_terminal():
+        return None
+    control = _PonderControl(player, position, time_limit, jobs, updates, active, current)
+    player.stop_event = control
+    # Pondering is not limited by the move time or the game clock until the hit
+    player.time_limit = float('inf')
+    player.time_manager.total_time = None
+    ponder_move = player.get_move(position)
+    player.time_limit = time_limit
+    player.time_manager.total_time = control.total_time
+    current['id'] = None
+    pending.extend(control.missed)
+    if control.hit is None:
+        return None
+    updates.put(('done', control.hit, ponder_move, time.time() - player.start_time))
+    return position, ponder_move
+
+
+def _worker_main(player_class, options, ponder, jobs, updates, active):
+    """
+    Worker process loop: search every position it is sent, streaming an 'info' message
+    after each completed depth and a 'done' message with the chosen move.
+    With ponder, the worker searches the predicted position between jobs.
+    """
+    player = player_class(**options)
+    time_limit = player.time_limit
+    current = {'id': None}  # Search the info messages belong to (None while pondering)
+
+    def report(depth, move, value, nodes):
+        if current['id'] is not None:
+            updates.put(('info', current['id'], depth, move, value, nodes))
+
+    player.on_iteration = report
+    pending = []
+    while True:
+        job = pending.pop(0) if pending else jobs.get()
+        if job is None:
+            break
+        search_id, game = job
+        if active.value != search_id:
+            continue  # Cancelled before it started
+        current['id'] = search_id
+        player.stop_event = SearchStop(active, search_id)
+        start = time.time()
+        move = player.get_move(game)
+        current['id'] = None
+        updates.put(('done', search_id, move, time.time() - start))
+        while ponder and move is not None and not pending:
+            result = _ponder(player, game, move, time_limit, jobs, updates, active, current, pending)
+            if result is None:
+                break
+            game, move = result
+
+
+class SearchWorker:
+    """
+    Runs the AI search in a separate process so the caller (the UI loop) never blocks.
+
+    start_search() sends a snapshot of the game; poll() returns the messages received
+    since the last call, only for the current search:
+        ('info', search_id, depth, best_move, value, nodes)  after each completed depth
+        ('done', search_id, move, seconds)                    when the search has finished
+    cancel() abandons the current search; close() stops the process.
+
+    With ponder, the worker keeps searching on the opponent's time: after each move it
+    searches the position after the reply it expects. If the next search is for that
+    position the ponder search simply continues under the normal time limit, so it
+    starts from the depth it already reached; otherwise it is abandoned, but the
+    transposition table keeps its results.
+    """
+
+    def __init__(self, player_class=AIPlayer, ponder=False, **options):
+        """
+        player_class(**options) is created in the worker process and kept between searches.
+        It must support the stop_event, on_iteration, time_limit, time_manager and
+        principal_variation attributes of AIPlayer.
+        """
+        self._jobs = mp.Queue()
+        self._updates = mp.Queue()
+        self._active = mp.RawValue('q', -1)
+        self._next_id = 0
+        self.search_id = None  # Id of the search in progress, or None
+        self._process = mp.Process(target=_worker_main, daemon=True,
+                                   args=(player_class, options, ponder, self._jobs, self._updates, self._active))
+        self._process.start()
+
+    @property
+    def searching(self):
+        return self.search_id is not None
+
+    def start_search(self, game):
+        """
+        Start searching a snapshot of the game (cancelling any search in progress).
+        Returns the id of the new search.
+        """
+        self.search_id = self._next_id
+        self._next_id += 1
+        self._active.value = self.search_id
+        self._jobs.put((self.search_id, game.clone()))
+        return self.search_id
+
+    def cancel(self):
+        """
+        Abandon the current search; its remaining messages are dropped.
+        """
+        self._active.value = -1
+        self.search_id = None
+
+    def poll(self):
+        """
+        Return the messages of the current search received since the last call (never blocks).
+        """
+        messages = []
+        while True:
+            try:
+                message = self._updates.get_nowait()
+            except queue.Empty:
+                break
+            if message[1] != self.search_id:
+                continue  # From a cancelled search
+            messages.append(message)
+            if message[0] == 'done':
+                self.search_id = None
+        return messages
+
+    def close(self):
+        """
+        Cancel any search and stop the worker process.
+        """
+        if self._process is None:
+            return
+        self.cancel()
+        self._jobs.put(None)
+        self._process.join(WORKER_EXIT_TIMEOUT)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
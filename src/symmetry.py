@@ -0,0 +1,102 @@
+# symmetry.py
+
+from bitboard import BOARD_SIZE, NUM_SQUARES, MOVE_TUPLES, encode_move, iter_squares
+from zobrist import ZOBRIST_PIECES, ZOBRIST_BLACK_TO_MOVE
+
+# The start position and the rules are unchanged by mirroring the files (A <-> I) and by
+# a 180 degree rotation that also swaps the colours and the side to move. With their
+# composition (a flip of the rows with colours swapped) and the identity they form a
+# group of four symmetries, each its own inverse. Positions related by a symmetry have
+# the same value for the side to move, so position caches can store one of them.
+IDENTITY, MIRROR, ROTATE, FLIP = range(4)
+NUM_SYMMETRIES = 4
+SWAPS_COLOURS = (False, False, True, True)
+
+# Image of each square under each symmetry
+SQUARE_MAPS = [
+    list(range(NUM_SQUARES)),
+    [sq - sq % BOARD_SIZE + BOARD_SIZE - 1 - sq % BOARD_SIZE for sq in range(NUM_SQUARES)],
+    [NUM_SQUARES - 1 - sq for sq in range(NUM_SQUARES)],
+    [(BOARD_SIZE - 1 - sq // BOARD_SIZE) * BOARD_SIZE + sq % BOARD_SIZE for sq in range(NUM_SQUARES)],
+]
+
+# Image of each encoded move (from_square * 81 + to_square) under each symmetry
+MOVE_MAPS = [[squares[code // NUM_SQUARES] * NUM_SQUARES + squares[code % NUM_SQUARES]
+              for code in range(NUM_SQUARES * NUM_SQUARES)] for squares in SQUARE_MAPS]
+
+# The Zobrist keys of the four images of a position packed into one 256-bit int, the key
+# under symmetry s in bits 64s .. 64s+63 (so the low 64 bits are the ordinary key).
+# XOR-ing a packed key updates all four at once, which keeps them as cheap to maintain
+# incrementally as the ordinary key.
+LANE_BITS = 64
+LANE_MASK = (1 << LANE_BITS) - 1
+SYMMETRIC_PIECES = [None] + [
+    [sum(ZOBRIST_PIECES[3 - player if SWAPS_COLOURS[s] else player][SQUARE_MAPS[s][sq]] << (LANE_BITS * s)
+         for s in range(NUM_SYMMETRIES)) for sq in range(NUM_SQUARES)]
+    for player in (1, 2)]
+SYMMETRIC_BLACK_TO_MOVE = sum(ZOBRIST_BLACK_TO_MOVE << (LANE_BITS * s) for s in range(NUM_SYMMETRIES))
+# With White to move, the images with colours swapped have Black to move
+SYMMETRIC_WHITE_TO_MOVE = sum(ZOBRIST_BLACK_TO_MOVE << (LANE_BITS * s)
+                              for s in range(NUM_SYMMETRIES) if SWAPS_COLOURS[s])
+
+
+def compute_symmetric_hash(pieces, current_player):
+    """
+    Compute the packed keys of the four images of a position from scratch.
+    FiancoGame keeps the same value up to date incrementally in make_move/undo_move.
+    """
+    key = SYMMETRIC_WHITE_TO_MOVE if current_player == 1 else SYMMETRIC_WHITE_TO_MOVE ^ SYMMETRIC_BLACK_TO_MOVE
+    for player in (1, 2):
+        table = SYMMETRIC_PIECES[player]
+        for sq in iter_squares(pieces[player]):
+            key ^= table[sq]
+    return key
+
+
+def symmetric_keys(symmetric_hash):
+    """
+    The four keys of a packed symmetric hash, indexed by symmetry.
+    """
+    return [(symmetric_hash >> (LANE_BITS * s)) & LANE_MASK for s in range(NUM_SYMMETRIES)]
+
+
+def canonical_key(symmetric_hash):
+    """
+    (key, symmetry): the smallest key of the four images of a position, and the symmetry
+    that maps the position (and its moves) onto that canonical image and back.
+    """
+    key, symmetry = symmetric_hash & LANE_MASK, IDENTITY
+    for s in (MIRROR, ROTATE, FLIP):
+        symmetric_hash >>= LANE_BITS
+        image_key = symmetric_hash & LANE_MASK
+        if image_key < key:
+            key, symmetry = image_key, s
+    return key, symmetry
+
+
+def transform_move(symmetry, move):
+    """
+    Image of a move tuple (start_i, start_j, end_i, end_j) under a symmetry.
+    """
+    return MOVE_TUPLES[MOVE_MAPS[symmetry][encode_move(move)]]
+
+
+def rotate_bits(bits):
+    """
+    Image of a bitboard under the 180 degree rotation (square sq becomes 80 - sq).
+    """
+    return int(format(bits, f'0{NUM_SQUARES}b')[::-1], 2)
+
+
+def transform_pieces(pieces, current_player, symmetry):
+    """
+    Image of a position under a symmetry: (pieces, current_player) with pieces indexed by player.
+    """
+    squares = SQUARE_MAPS[symmetry]
+    images = [0, 0, 0]
+    for player in (1, 2):
+        for sq in iter_squares(pieces[player]):
+            images[player] |= 1 << squares[sq]
+    if SWAPS_COLOURS[symmetry]:
+        return [0, images[2], images[1]], 3 - current_player
+    return images, current_player
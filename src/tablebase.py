@@ -0,0 +1,349 @@
+# tablebase.py
+
+import argparse
+import mmap
+import os
+import struct
+import time
+from math import comb
+from multiprocessing import Pool
+from bitboard import NUM_SQUARES, GOAL_MASKS, BOARD_SIZE, generate_moves, iter_squares
+from symmetry import rotate_bits
+
+# Endgame tablebases: every position with nw White and nb Black pieces (and either side
+# to move) is solved by retrograde analysis and stored as one uint16 per position in
+# fianco_<nw>v<nb>.ftb, addressed by a combinatorial index. Values are from the point
+# of view of the side to move:
+#   DRAW (0)          no forced result (also used for positions never resolved)
+#   WIN  | distance   the side to move wins in `distance` plies
+#   LOSS | distance   the side to move loses in `distance` plies
+#   ILLEGAL           two pieces on the same square
+# Repetition depends on the move history, so it is ignored here.
+# Rotating a position by 180 degrees and swapping the colours (see symmetry.py) keeps its
+# value for the side to move, so only tables with at least as many White as Black pieces
+# are generated: positions with more Black pieces are probed through their rotated image.
+
+DRAW = 0
+WIN = 0x4000
+LOSS = 0x8000
+ILLEGAL = 0xFFFF
+DISTANCE_MASK = 0x3FFF
+
+MAGIC = b'FTB1'
+# magic, white pieces, black pieces, complete flag, passes done, longest distance
+HEADER = struct.Struct('<4sBBHII')
+HEADER_SIZE = 16
+
+
+def table_name(num_white, num_black):
+    return f"fianco_{num_white}v{num_black}.ftb"
+
+
+def num_sets(count):
+    """
+    Number of ways to place `count` pieces of one colour on the board.
+    """
+    return comb(NUM_SQUARES, count)
+
+
+def table_size(num_white, num_black):
+    """
+    Number of entries in the table for a material signature (both sides to move).
+    """
+    return 2 * num_sets(num_white) * num_sets(num_black)
+
+
+def rank_set(bits):
+    """
+    Combinatorial rank of a set of squares: sum of C(square_k, k) over the squares in
+    ascending order (k = 1, 2, ...). The ranks of all k-square sets are 0 .. C(81, k) - 1.
+    """
+    rank = 0
+    for k, sq in enumerate(iter_squares(bits), 1):
+        rank += comb(sq, k)
+    return rank
+
+
+def unrank_set(rank, count):
+    """
+    Inverse of rank_set: the bitboard of the count-square set with the given rank.
+    """
+    bits = 0
+    sq = NUM_SQUARES
+    for k in range(count, 0, -1):
+        sq -= 1
+        while comb(sq, k) > rank:
+            sq -= 1
+        rank -= comb(sq, k)
+        bits |= 1 << sq
+    return bits
+
+
+def position_index(white, black, player):
+    """
+    Index of a position in the table of its material signature.
+    """
+    num_black = black.bit_count()
+    row = (player - 1) * num_sets(white.bit_count()) + rank_set(white)
+    return row * num_sets(num_black) + rank_set(black)
+
+
+def decode_value(value):
+    """
+    Convert a stored value into (result, distance) with result 'win', 'loss' or 'draw'.
+    """
+    if value == DRAW or value == ILLEGAL:
+        return 'draw', 0
+    return ('win' if value & WIN else 'loss'), value & DISTANCE_MASK
+
+
+class Tablebase:
+    """
+    Read-only access to generated tablebase files.
+    Files are memory-mapped on first use, so probing never loads a table into RAM and
+    costs one index computation and one 2-byte read.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._tables = {}
+        self.max_pieces = 0  # Largest per-side piece count of any table file
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.startswith('fianco_') and name.endswith('.ftb'):
+                    num_white, num_black = name[len('fianco_'):-len('.ftb')].split('v')
+                    self.max_pieces = max(self.max_pieces, int(num_white), int(num_black))
+
+    def _table(self, num_white, num_black):
+        key = (num_white, num_black)
+        if key not in self._tables:
+            path = os.path.join(self.directory, table_name(num_white, num_black))
+            table = None
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                if HEADER.unpack_from(mapped)[3]:
+                    table = memoryview(mapped)[HEADER_SIZE:].cast('H')
+            self._tables[key] = table
+        return self._tables[key]
+
+    def probe_raw(self, white, black, player):
+        """
+        Stored value of a position, or None if its table is not available.
+        A side without pieces has lost, so such positions never need a table.
+        """
+        if not white or not black:
+            return LOSS if not (white if player == 1 else black) else WIN
+        num_white, num_black = white.bit_count(), black.bit_count()
+        table = self._table(num_white, num_black)
+        if table is None:
+            table = self._table(num_black, num_white)
+            if table is None:
+                return None
+            white, black, player = rotate_bits(black), rotate_bits(white), 3 - player
+        return table[position_index(white, black, player)]
+
+    def probe(self, game):
+        """
+        Probe a game position. Returns (result, distance) or None if not covered.
+        """
+        value = self.probe_raw(game.pieces[1], game.pieces[2], game.current_player)
+        return None if value is None else decode_value(value)
+
+
+def _apply(own, opp, move):
+    """
+    Play a move on raw bitboards and return the new (own, opp).
+    """
+    start_i, start_j, end_i, end_j = move
+    own ^= (1 << (start_i * BOARD_SIZE + start_j)) | (1 << (end_i * BOARD_SIZE + end_j))
+    if abs(start_i - end_i) == 2:
+        opp &= ~(1 << ((start_i + end_i) // 2 * BOARD_SIZE + (start_j + end_j) // 2))
+    return own, opp
+
+
+def _terminal_value(white, black, player):
+    """
+    Value of a position decided without looking further, or None.
+    """
+    if white & GOAL_MASKS[1]:
+        return WIN if player == 1 else LOSS
+    if black & GOAL_MASKS[2]:
+        return WIN if player == 2 else LOSS
+    own, opp = (white, black) if player == 1 else (black, white)
+    if not generate_moves(own, opp, player):
+        return LOSS  # No moves left
+    return None
+
+
+# Per-process state of the pool workers
+_worker = {}
+
+
+def _worker_tables(directory, num_white, num_black):
+    """
+    Load (once per worker process) the lower tables and the black square sets of a signature.
+    """
+    key = (directory, num_white, num_black)
+    if _worker.get('key') != key:
+        _worker.clear()
+        _worker['key'] = key
+        _worker['lower'] = Tablebase(directory)
+        _worker['black_sets'] = [unrank_set(rank, num_black) for rank in range(num_sets(num_black))]
+    return _worker['lower'], _worker['black_sets']
+
+
+def _solve_rows(args):
+    """
+    Process the table rows [first_row, last_row) for one pass.
+    Pass 0 marks illegal and terminal positions; pass k resolves positions won or lost
+    in exactly k plies using the values of the previous passes.
+    Returns a list of (index, value) updates.
+    """
+    directory, num_white, num_black, first_row, last_row, pass_number = args
+    lower, black_sets = _worker_tables(directory, num_white, num_black)
+    white_count = num_sets(num_white)
+    black_count = len(black_sets)
+    path = os.path.join(directory, table_name(num_white, num_black) + '.partial')
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    values = memoryview(mapped)[HEADER_SIZE:].cast('H')
+
+    updates = []
+    for row in range(first_row, last_row):
+        player = 1 + row // white_count
+        white = unrank_set(row % white_count, num_white)
+        base = row * black_count
+        for black_rank, black in enumerate(black_sets):
+            index = base + black_rank
+            if pass_number == 0:
+                if white & black:
+                    updates.append((index, ILLEGAL))
+                else:
+                    value = _terminal_value(white, black, player)
+                    if value is not None:
+                        updates.append((index, value))
+                continue
+            if values[index] != DRAW:
+                continue
+            own, opp = (white, black) if player == 1 else (black, white)
+            best_loss = None  # Shortest loss among the children (a win for us)
+            worst_win = 0  # Longest win among the children, if they are all wins for the opponent
+            all_wins = True
+            for move in generate_moves(own, opp, player):
+                child_own, child_opp = _apply(own, opp, move)
+                child_white, child_black = (child_own, child_opp) if player == 1 else (child_opp, child_own)
+                if child_white.bit_count() == num_white and child_black.bit_count() == num_black:
+                    child = values[position_index(child_white, child_black, 3 - player)]
+                else:
+                    child = lower.probe_raw(child_white, child_black, 3 - player)
+                if child is None or child == DRAW:
+                    all_wins = False
+                elif child & LOSS:
+                    distance = child & DISTANCE_MASK
+                    if best_loss is None or distance < best_loss:
+                        best_loss = distance
+                else:
+                    worst_win = max(worst_win, child & DISTANCE_MASK)
+            if best_loss is not None:
+                if best_loss + 1 <= pass_number:
+                    updates.append((index, WIN | (best_loss + 1)))
+            elif all_wins and worst_win + 1 <= pass_number:
+                updates.append((index, LOSS | (worst_win + 1)))
+    del values
+    mapped.close()
+    return updates
+
+
+def _write_partial(path, num_white, num_black, passes, longest, values):
+    """
+    Save the table after a pass (atomically), so generation can resume from it.
+    """
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, num_white, num_black, 0, passes, longest).ljust(HEADER_SIZE, b'\0'))
+        f.write(values)
+    os.replace(tmp_path, path)
+
+
+def solve_signature(directory, num_white, num_black, pool, rows_per_task=8, log=print):
+    """
+    Solve one material signature, resuming from its .partial file if there is one.
+    Tables with fewer pieces must already be complete.
+    """
+    final_path = os.path.join(directory, table_name(num_white, num_black))
+    if os.path.exists(final_path):
+        return
+    path = final_path + '.partial'
+    size = table_size(num_white, num_black)
+    passes, longest = 0, 0
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            _, _, _, _, passes, longest = HEADER.unpack(f.read(HEADER.size))
+            f.seek(HEADER_SIZE)
+            values = bytearray(f.read())
+        log(f"{table_name(num_white, num_black)}: resuming after pass {passes - 1}")
+    else:
+        values = bytearray(2 * size)
+        _write_partial(path, num_white, num_black, 0, 0, values)
+    view = memoryview(values).cast('H')
+
+    # Longest result in the tables this one can capture into: resolved positions may
+    # still appear that many plies after the last pass that changed anything
+    lower_longest = 0
+    for lower_white, lower_black in ((num_white - 1, num_black), (num_white, num_black - 1)):
+        lower_path = os.path.join(directory, table_name(*sorted((lower_white, lower_black), reverse=True)))
+        if lower_white and lower_black:
+            with open(lower_path, 'rb') as f:
+                lower_longest = max(lower_longest, HEADER.unpack(f.read(HEADER.size))[5])
+
+    rows = 2 * num_sets(num_white)
+    quiet_passes = 0
+    while quiet_passes <= lower_longest + 1:
+        start = time.time()
+        tasks = [(directory, num_white, num_black, first, min(rows, first + rows_per_task), passes)
+                 for first in range(0, rows, rows_per_task)]
+        changed = 0
+        for updates in pool.imap_unordered(_solve_rows, tasks):
+            for index, value in updates:
+                view[index] = value
+                if value != ILLEGAL:
+                    longest = max(longest, value & DISTANCE_MASK)
+            changed += len(updates)
+        passes += 1
+        quiet_passes = 0 if changed else quiet_passes + 1
+        _write_partial(path, num_white, num_black, passes, longest, values)
+        log(f"{table_name(num_white, num_black)}: pass {passes - 1} resolved {changed} positions "
+            f"in {time.time() - start:.1f}s")
+
+    del view
+    with open(path, 'r+b') as f:
+        f.write(HEADER.pack(MAGIC, num_white, num_black, 1, passes, longest))
+    os.replace(path, final_path)
+
+
+def generate(directory, max_pieces, processes=None, log=print):
+    """
+    Generate all tables with 1..max_pieces pieces per side and at least as many White as
+    Black pieces, smallest material first. Already complete tables are skipped and
+    interrupted ones resume, so the command can be rerun.
+    """
+    os.makedirs(directory, exist_ok=True)
+    signatures = sorted(((w, b) for w in range(1, max_pieces + 1) for b in range(1, w + 1)),
+                        key=lambda signature: (sum(signature), signature))
+    with Pool(processes) as pool:
+        for num_white, num_black in signatures:
+            solve_signature(directory, num_white, num_black, pool, log=log)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate Fianco endgame tablebases")
+    parser.add_argument('directory')
+    parser.add_argument('--max-pieces', type=int, default=1, help="pieces per side (2 takes hours in pure Python)")
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+    generate(args.directory, args.max_pieces, args.processes)
+
+
+if __name__ == "__main__":
+    main()
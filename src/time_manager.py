@@ -0,0 +1,90 @@
+# time_manager.py
+
+import time
+
+# Expected number of moves each side still has to play, used to split a game clock
+EXPECTED_MOVES_PER_SIDE = 30
+MIN_MOVES_TO_GO = 8
+
+# Fraction of the soft limit after which a new iteration is not started,
+# since the next depth usually takes several times longer than the last one
+ITERATION_START_FRACTION = 0.5
+
+# Soft limit multipliers
+INSTABILITY_EXTENSION = 1.5  # Applied each time the best move changes between depths
+STABLE_REDUCTION = 0.6  # Applied once the best move has been stable for STABLE_ITERATIONS depths
+STABLE_ITERATIONS = 3
+
+
+class TimeManager:
+    """
+    Decides how long a search may take.
+
+    The soft limit is the target thinking time: iterative deepening does not start a new
+    depth once a good part of it is used. The hard limit is never exceeded: the search is
+    aborted and the last completed depth is used.
+    """
+
+    def __init__(self, time_limit=5.0, total_time=None):
+        """
+        time_limit: maximum seconds for a single move.
+        total_time: optional game clock in seconds for the whole game; the remaining
+        part (total_time - game.player_time[player]) is split over the moves still to play.
+        """
+        self.time_limit = time_limit
+        self.total_time = total_time
+        self.start_time = None
+        self.soft_limit = time_limit
+        self.hard_limit = time_limit
+        self.best_move = None
+        self.stable_iterations = 0
+
+    def start(self, game):
+        """
+        Start the clock for a move of the player to move in game.
+        """
+        self.start_time = time.time()
+        self.best_move = None
+        self.stable_iterations = 0
+        hard = self.time_limit
+        if self.total_time is not None:
+            remaining = max(0.0, self.total_time - game.player_time[game.current_player])
+            moves_to_go = max(MIN_MOVES_TO_GO, EXPECTED_MOVES_PER_SIDE - game.move_count // 2)
+            allocation = remaining / moves_to_go
+            # Never bet more than a quarter of the clock (or three allocations) on one move
+            hard = min(hard, remaining * 0.25, allocation * 3)
+            soft = min(allocation, hard)
+        else:
+            soft = hard * 0.6
+        self.hard_limit = hard
+        self.soft_limit = soft
+
+    @property
+    def deadline(self):
+        """
+        Absolute time (as returned by time.time()) at which the search must stop.
+        """
+        return self.start_time + self.hard_limit
+
+    def elapsed(self):
+        return time.time() - self.start_time
+
+    def can_start_iteration(self):
+        """
+        Whether there is enough time left to make starting another depth worthwhile.
+        """
+        return self.elapsed() < self.soft_limit * ITERATION_START_FRACTION
+
+    def iteration_finished(self, best_move):
+        """
+        Update the soft limit after a completed depth: extend it when the best move
+        changed, shrink it once the best move has been stable for a while.
+        """
+        if self.best_move is not None and best_move != self.best_move:
+            self.soft_limit = min(self.hard_limit, self.soft_limit * INSTABILITY_EXTENSION)
+            self.stable_iterations = 0
+        else:
+            self.stable_iterations += 1
+            if self.stable_iterations == STABLE_ITERATIONS:
+                self.soft_limit *= STABLE_REDUCTION
+        self.best_move = best_move
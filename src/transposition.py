@@ -0,0 +1,119 @@
+# transposition.py
+
+# Bound types stored with each score
+EXACT = 0
+LOWER = 1  # Score is a lower bound (the search failed high)
+UPPER = 2  # Score is an upper bound (the search failed low)
+
+# Each slot is three 64-bit words: check (key ^ score bits ^ meta), score (a double) and meta.
+# meta packs the best move (+1, 0 = none), depth (+128), bound flag and search age.
+SLOT_WORDS = 3
+SLOT_BYTES = SLOT_WORDS * 8
+BUCKET_SLOTS = 2  # Slot 0 is depth-preferred, slot 1 is always-replace
+BUCKET_BYTES = BUCKET_SLOTS * SLOT_BYTES
+
+_DEPTH_OFFSET = 128
+
+
+class TranspositionTable:
+    """
+    Fixed-size transposition table keyed by 64-bit Zobrist hashes.
+
+    Entries live in one flat buffer so the memory use is bounded by `size_mb`
+    (and so the buffer can later be shared between processes). Each bucket has a
+    depth-preferred slot and an always-replace slot. The key is stored XOR-ed with
+    the entry data, so a slot whose words were overwritten mid-update simply fails
+    the check instead of returning mixed data.
+    """
+
+    def __init__(self, size_mb=16, buffer=None):
+        """
+        Allocate a table of about size_mb megabytes, or wrap an existing writable buffer.
+        """
+        if buffer is None:
+            buffer = bytearray(self.size_in_bytes(size_mb))
+        self.buffer = buffer
+        self.words = memoryview(buffer).cast('B').cast('Q')
+        self.scores = memoryview(buffer).cast('B').cast('d')
+        self.num_buckets = len(self.words) // (BUCKET_SLOTS * SLOT_WORDS)
+        self.age = 0
+
+    @staticmethod
+    def size_in_bytes(size_mb):
+        """
+        Buffer size used for a table of about size_mb megabytes (a whole number of buckets).
+        """
+        return max(1, int(size_mb * 1024 * 1024) // BUCKET_BYTES) * BUCKET_BYTES
+
+    def release(self):
+        """
+        Drop the views on the buffer (required before closing a shared memory block).
+        """
+        self.words.release()
+        self.scores.release()
+        if isinstance(self.buffer, memoryview):
+            self.buffer.release()
+
+    def new_search(self):
+        """
+        Start a new search generation; entries from older searches become preferred victims.
+        """
+        self.age = (self.age + 1) & 0xFF
+
+    def clear(self):
+        """
+        Remove all entries.
+        """
+        self.words[:] = memoryview(bytes(len(self.words) * 8)).cast('Q')
+        self.age = 0
+
+    def probe(self, key):
+        """
+        Look up a position.
+        Returns (depth, flag, score, move_code) or None; move_code is -1 if no best move was stored.
+        """
+        words = self.words
+        base = (key % self.num_buckets) * BUCKET_SLOTS * SLOT_WORDS
+        for slot in (base, base + SLOT_WORDS):
+            meta = words[slot + 2]
+            if words[slot] ^ words[slot + 1] ^ meta == key and meta:
+                return (((meta >> 16) & 0xFF) - _DEPTH_OFFSET, (meta >> 24) & 0x3,
+                        self.scores[slot + 1], (meta & 0xFFFF) - 1)
+        return None
+
+    def store(self, key, depth, flag, score, move_code=-1):
+        """
+        Store a search result, using the depth-preferred slot when the new entry is at least
+        as deep as its occupant (or the occupant is from an older search), else the always-replace slot.
+        """
+        words = self.words
+        base = (key % self.num_buckets) * BUCKET_SLOTS * SLOT_WORDS
+        meta = words[base + 2]
+        if (words[base] ^ words[base + 1] ^ meta == key
+                or depth >= ((meta >> 16) & 0xFF) - _DEPTH_OFFSET
+                or (meta >> 32) & 0xFF != self.age):
+            slot = base
+        else:
+            slot = base + SLOT_WORDS
+        meta = (move_code + 1) | ((depth + _DEPTH_OFFSET) << 16) | (flag << 24) | (self.age << 32)
+        self.scores[slot + 1] = score
+        words[slot + 2] = meta
+        words[slot] = key ^ words[slot + 1] ^ meta
+
+    def entries(self):
+        """
+        Iterate over the occupied slots as (depth, flag, score, move_code), as returned by probe.
+        Slots left inconsistent by concurrent writers are included.
+        """
+        words = self.words
+        for slot in range(0, len(words), SLOT_WORDS):
+            meta = words[slot + 2]
+            if meta:
+                yield (((meta >> 16) & 0xFF) - _DEPTH_OFFSET, (meta >> 24) & 0x3,
+                       self.scores[slot + 1], (meta & 0xFFFF) - 1)
+
+    def __len__(self):
+        """
+        Number of slots in the table.
+        """
+        return self.num_buckets * BUCKET_SLOTS
@@ -5,15 +5,22 @@ import sys
 from constants import BOARD_SIZE, SQUARE_SIZE, WIDTH, HEIGHT, WHITE, BLACK, LIGHT_BROWN, DARK_BROWN, GREEN, RED, FPS
 from fianco_game import convert_move_to_notation
 from fianco_game import FiancoGame
+from bitboard import iter_squares
+from game_record import GameRecord, write_game
+
+# Rendered text surfaces kept by GameUI (move log lines, timers, labels)
+TEXT_CACHE_SIZE = 512
 
 class GameUI:
     """
     Handles all Pygame UI elements, user interactions, and rendering.
     """
 
-    def __init__(self, game, human_player, ai_player, ai_instance):
+    def __init__(self, game, human_player, ai_player, search_worker, record_path=None):
         """
         Initialize the UI with the game instance and player roles.
+        search_worker: SearchWorker running the AI, so searching never blocks the frame loop.
+        record_path: optional game record file the game is appended to when the window closes.
         """
         pygame.init()
         self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
@@ -28,11 +35,19 @@ class GameUI:
         self.game = game
         self.human_player = human_player
         self.ai_player = ai_player
-        self.ai_instance = ai_instance
+        self.search_worker = search_worker
+        self.record_path = record_path
 
         self.selected_piece = None
         self.valid_moves = []
-        self.ai_thinking = False
+        self.ai_move_start_time = None
+        self.search_info = None  # (depth, best move, evaluation) of the search in progress
+
+        # Rendering caches: the static board, rendered text, and what the last frame showed
+        self._text_cache = {}
+        self.board_surface = self._render_static_board()
+        self._scene = None
+        self._timers = None
 
         # Initialize player timers
         self.start_time = pygame.time.get_ticks()
@@ -61,7 +76,10 @@ class GameUI:
                         running = False
                         continue
                     if event.key == pygame.K_u:
-                        # Undo move when 'U' key is pressed
+                        # Undo move when 'U' key is pressed, abandoning the AI's search if it is thinking
+                        if self.search_worker.searching:
+                            self.search_worker.cancel()
+                            self.search_info = None
                         self.game.undo_move()
                         self.game.player_time[self.game.current_player] -= self.move_duration
                         # If it's AI's turn after undo, undo again to go back to human's turn
@@ -76,30 +94,48 @@ class GameUI:
                 continue
 
             if self.game.current_player == self.ai_player:
-                if not self.ai_thinking:
-                    self.ai_thinking = True
-                    ai_move_start_time = pygame.time.get_ticks()
-                    ai_move = self.ai_instance.get_move(self.game)
-                    ai_move_end_time = pygame.time.get_ticks()
-                    ai_move_duration = (ai_move_end_time - ai_move_start_time) / 1000.0
-                    self.game.ai_time += ai_move_duration
-                    self.game.player_time[self.ai_player] += ai_move_duration
-                    self.game.make_move(ai_move, ai_move_duration)
-                    self.last_move_time = ai_move_end_time
-                    self.move_duration = ai_move_duration
-                    self.ai_thinking = False
+                if not self.search_worker.searching:
+                    self.ai_move_start_time = pygame.time.get_ticks()
+                    self.search_info = None
+                    self.search_worker.start_search(self.game)
+                # The search runs in the worker process: just collect its progress
+                for message in self.search_worker.poll():
+                    if message[0] == 'info':
+                        _, _, depth, best_move, value, _ = message
+                        self.search_info = (depth, best_move, value)
+                    else:
+                        ai_move = message[2]
+                        ai_move_end_time = pygame.time.get_ticks()
+                        ai_move_duration = (ai_move_end_time - self.ai_move_start_time) / 1000.0
+                        self.game.ai_time += ai_move_duration
+                        self.game.player_time[self.ai_player] += ai_move_duration
+                        self.game.make_move(ai_move, ai_move_duration)
+                        self.last_move_time = ai_move_end_time
+                        self.move_duration = ai_move_duration
+                        self.search_info = None
             else:
                 # Update player's time
                 self.move_duration = elapsed_time
                 self.game.player_time[self.human_player] += (current_time - self.last_move_time) / 1000.0
                 self.last_move_time = current_time
 
-            self.draw_board()
-            pygame.display.flip()
+            self.render()
 
+        if self.record_path and self.game.move_history:
+            self.save_record()
+        self.search_worker.close()
         pygame.quit()
         sys.exit()
 
+    def save_record(self):
+        """
+        Append the game to the record file (unfinished games get the result '*').
+        """
+        names = {self.human_player: 'Human', self.ai_player: 'AI'}
+        record = GameRecord.from_game(self.game, Event='Fianco', White=names[1], Black=names[2])
+        with open(self.record_path, 'a') as f:
+            write_game(f, record)
+
     def handle_mouse_click(self, position):
         """
         Handle mouse click events for selecting and moving pieces.
@@ -128,41 +164,90 @@ class GameUI:
                 possible_moves = self.game.get_possible_moves(self.human_player)
                 self.valid_moves = [move for move in possible_moves if move[0] == row and move[1] == col]
 
-    def draw_board(self):
+    def _text(self, font, text, color):
         """
-        Render the game board, pieces, highlights, move log, and captured pieces.
+        Rendered text surface, cached: labels and move log lines are drawn again every frame
+        the scene changes but are only rendered once.
         """
-        # Clear the screen
-        self.screen.fill((245, 245, 220))  # Light beige background
+        key = (id(font), text, color)
+        surface = self._text_cache.get(key)
+        if surface is None:
+            if len(self._text_cache) >= TEXT_CACHE_SIZE:
+                self._text_cache.clear()
+            surface = self._text_cache[key] = font.render(text, True, color)
+        return surface
 
-        # Draw the board squares and pieces
+    def _render_static_board(self):
+        """
+        Pre-render the parts of the board that never change: squares and coordinate labels.
+        """
+        surface = pygame.Surface((BOARD_SIZE * SQUARE_SIZE, BOARD_SIZE * SQUARE_SIZE))
         for row in range(BOARD_SIZE):
             for col in range(BOARD_SIZE):
                 rect = pygame.Rect(col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE)
                 color = LIGHT_BROWN if (row + col) % 2 == 0 else DARK_BROWN
-                pygame.draw.rect(self.screen, color, rect)
-
-                # Highlight selected piece
-                if self.selected_piece and self.selected_piece[0] == row and self.selected_piece[1] == col:
-                    pygame.draw.rect(self.screen, GREEN, rect, 3)
-
-                # Highlight valid moves
-                for move in self.valid_moves:
-                    if move[2] == row and move[3] == col:
-                        pygame.draw.rect(self.screen, RED, rect, 3)
-
-                # Draw pieces
-                piece = self.game.board[row][col]
-                if piece != 0:
-                    center = (col * SQUARE_SIZE + SQUARE_SIZE // 2, row * SQUARE_SIZE + SQUARE_SIZE // 2)
-                    radius = SQUARE_SIZE // 2 - 10
-                    piece_color = WHITE if piece == 1 else BLACK
-                    pygame.draw.circle(self.screen, piece_color, center, radius)
-
-                # Draw coordinate labels
+                pygame.draw.rect(surface, color, rect)
                 coord_label = chr(col + ord('A')) + str(9 - row)
                 text_surface = self.font_coords.render(coord_label, True, BLACK)
-                self.screen.blit(text_surface, (col * SQUARE_SIZE + 5, row * SQUARE_SIZE + SQUARE_SIZE - 18))
+                surface.blit(text_surface, (col * SQUARE_SIZE + 5, row * SQUARE_SIZE + SQUARE_SIZE - 18))
+        return surface
+
+    def _scene_state(self):
+        """
+        Everything the board and side panel depend on; they are redrawn only when it changes.
+        """
+        last_move = self.game.move_history[-1] if self.game.move_history else None
+        return (self.game.hash, self.game.move_count, last_move, self.selected_piece, tuple(self.valid_moves),
+                self.search_worker.searching, self.search_info)
+
+    def _timer_texts(self):
+        return (f"Your Time: {self.game.player_time[self.human_player]:.1f}s",
+                f"AI Time: {self.game.player_time[self.ai_player]:.1f}s")
+
+    def render(self, force=False):
+        """
+        Draw the frame and update only what changed: the whole window when the position,
+        selection or search progress changed, otherwise just the timer strip when a timer moved on.
+        Returns the list of updated rectangles (empty when nothing was drawn).
+        """
+        dirty = []
+        scene = self._scene_state()
+        if force or scene != self._scene:
+            self._scene = scene
+            self.draw_board()
+            dirty.append(self.screen.get_rect())
+        elif self._timer_texts() != self._timers:
+            dirty.append(self.draw_timers())
+        if dirty:
+            pygame.display.update(dirty)
+        return dirty
+
+    def draw_board(self):
+        """
+        Render the game board, pieces, highlights, move log, and captured pieces.
+        """
+        # Clear the screen
+        self.screen.fill((245, 245, 220))  # Light beige background
+
+        # Squares and coordinates come pre-rendered
+        self.screen.blit(self.board_surface, (0, 0))
+
+        # Highlight selected piece
+        if self.selected_piece:
+            row, col = self.selected_piece
+            pygame.draw.rect(self.screen, GREEN, (col * SQUARE_SIZE, row * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE), 3)
+
+        # Highlight valid moves
+        for move in self.valid_moves:
+            pygame.draw.rect(self.screen, RED, (move[3] * SQUARE_SIZE, move[2] * SQUARE_SIZE, SQUARE_SIZE, SQUARE_SIZE), 3)
+
+        # Draw pieces
+        radius = SQUARE_SIZE // 2 - 10
+        for piece, piece_color in ((1, WHITE), (2, BLACK)):
+            for sq in iter_squares(self.game.pieces[piece]):
+                row, col = divmod(sq, BOARD_SIZE)
+                center = (col * SQUARE_SIZE + SQUARE_SIZE // 2, row * SQUARE_SIZE + SQUARE_SIZE // 2)
+                pygame.draw.circle(self.screen, piece_color, center, radius)
 
         # Draw move log background
         move_log_rect = pygame.Rect(BOARD_SIZE * SQUARE_SIZE, 0, WIDTH - BOARD_SIZE * SQUARE_SIZE, HEIGHT)
@@ -177,16 +262,14 @@ class GameUI:
             move_notation = convert_move_to_notation(move_coords)
             move_time_text = f"({move_duration:.1f}s)"
             if player == self.ai_player:
-                move_text = f"B: {move_notation} {move_time_text}"
-                text_surface = self.font_moves.render(move_text, True, RED)
+                text_surface = self._text(self.font_moves, f"B: {move_notation} {move_time_text}", RED)
             else:
-                move_text = f"W: {move_notation} {move_time_text}"
-                text_surface = self.font_moves.render(move_text, True, BLACK)
+                text_surface = self._text(self.font_moves, f"W: {move_notation} {move_time_text}", BLACK)
             self.screen.blit(text_surface, (move_log_start_x, move_log_start_y + idx * line_height))
 
         # Display captured pieces (properly indented outside the loop)
         captured_pieces_start_y = move_log_start_y + len(recent_moves) * line_height + 30
-        text_surface = self.font_pieces.render("Captured Pieces:", True, BLACK)
+        text_surface = self._text(self.font_pieces, "Captured Pieces:", BLACK)
         self.screen.blit(text_surface, (move_log_start_x, captured_pieces_start_y))
 
         # Draw captured white pieces (captured by black)
@@ -199,17 +282,32 @@ class GameUI:
             center = (move_log_start_x + 20 + i * 25, captured_pieces_start_y + 80)
             pygame.draw.circle(self.screen, BLACK, center, 10)
 
-        # Draw player timers at the bottom of the screen
+        # Show the progress of the AI's search at the bottom of the side panel
+        if self.search_worker.searching:
+            lines = ["AI thinking..."]
+            if self.search_info is not None:
+                depth, best_move, value = self.search_info
+                lines = [f"AI depth {depth}: {convert_move_to_notation(best_move)}", f"Evaluation: {value:+.1f}"]
+            for idx, line in enumerate(lines):
+                text_surface = self._text(self.font_moves, line, BLACK)
+                self.screen.blit(text_surface, (move_log_start_x, HEIGHT - 50 + idx * line_height))
+
+        self.draw_timers()
+
+    def draw_timers(self):
+        """
+        Draw the player timers at the bottom of the screen and return the strip's rectangle.
+        """
         timer_start_y = HEIGHT - 40
         timer_background_rect = pygame.Rect(0, BOARD_SIZE * SQUARE_SIZE, BOARD_SIZE * SQUARE_SIZE, 50)
         pygame.draw.rect(self.screen, (200, 200, 200), timer_background_rect)  # Background for timers
 
-        timer_text = f"Your Time: {self.game.player_time[self.human_player]:.1f}s"
-        ai_timer_text = f"AI Time: {self.game.player_time[self.ai_player]:.1f}s"
-        text_surface = self.font_pieces.render(timer_text, True, BLACK)
+        self._timers = timer_text, ai_timer_text = self._timer_texts()
+        text_surface = self._text(self.font_pieces, timer_text, BLACK)
         self.screen.blit(text_surface, (10, timer_start_y))
-        ai_text_surface = self.font_pieces.render(ai_timer_text, True, BLACK)
+        ai_text_surface = self._text(self.font_pieces, ai_timer_text, BLACK)
         self.screen.blit(ai_text_surface, (BOARD_SIZE * SQUARE_SIZE // 2, timer_start_y))
+        return timer_background_rect
 
     def display_game_over(self, winner):
         """
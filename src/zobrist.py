@@ -0,0 +1,24 @@
+# zobrist.py
+
+import random
+from bitboard import NUM_SQUARES, iter_squares
+
+# Fixed seed so keys (and anything stored under them, like book files) are stable across runs
+ZOBRIST_SEED = 0x5F1A2C0
+
+_rng = random.Random(ZOBRIST_SEED)
+ZOBRIST_PIECES = [None] + [[_rng.getrandbits(64) for _ in range(NUM_SQUARES)] for _ in (1, 2)]
+ZOBRIST_BLACK_TO_MOVE = _rng.getrandbits(64)
+
+
+def compute_hash(pieces, current_player):
+    """
+    Compute the 64-bit Zobrist key of a position from scratch.
+    FiancoGame keeps the same key up to date incrementally in make_move/undo_move.
+    """
+    key = ZOBRIST_BLACK_TO_MOVE if current_player == 2 else 0
+    for player in (1, 2):
+        table = ZOBRIST_PIECES[player]
+        for sq in iter_squares(pieces[player]):
+            key ^= table[sq]
+    return key